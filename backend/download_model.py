@@ -1,25 +1,116 @@
 """
 Pre-download sentence-transformers model with progress display
 """
+import os
 import sys
+import time
+import warnings
 import traceback
+import importlib.util
+
+MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+
+# Files that must all be present for the model to load without a download
+REQUIRED_MODEL_FILES = ('config.json', 'modules.json')
+MODEL_WEIGHT_FILES = ('model.safetensors', 'pytorch_model.bin')
+
+
+def configure_fast_download():
+    """
+    Tune huggingface_hub downloads before it is imported.
+    
+    Enables the Rust hf_transfer downloader (parallel range requests) when the
+    package is installed, and allows slower links more time per request.
+    Existing environment settings are left untouched.
+    
+    Returns:
+        True if hf_transfer will be used
+    """
+    os.environ.setdefault("HF_HUB_DOWNLOAD_TIMEOUT", "60")
+    
+    if "HF_HUB_ENABLE_HF_TRANSFER" not in os.environ:
+        # huggingface_hub errors if this is set without the package installed
+        if importlib.util.find_spec("hf_transfer") is not None:
+            os.environ["HF_HUB_ENABLE_HF_TRANSFER"] = "1"
+    
+    return os.environ.get("HF_HUB_ENABLE_HF_TRANSFER", "").upper() in ("1", "ON", "YES", "TRUE")
+
+
+def get_model_cache_dir():
+    """
+    Resolve where the embedding model will be cached.
+    
+    Mirrors the lookup used by sentence-transformers and huggingface_hub, so
+    the RAG system finds the same files. Point HF_HOME (or
+    SENTENCE_TRANSFORMERS_HOME) at a shared volume to download only once
+    across users, containers, and CI runs.
+    
+    Returns:
+        Absolute path of the model cache directory
+    """
+    if os.environ.get("SENTENCE_TRANSFORMERS_HOME"):
+        return os.path.abspath(os.environ["SENTENCE_TRANSFORMERS_HOME"])
+    if os.environ.get("HF_HUB_CACHE"):
+        return os.path.abspath(os.environ["HF_HUB_CACHE"])
+    hf_home = os.environ.get("HF_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache", "huggingface"
+    )
+    return os.path.join(os.path.abspath(hf_home), "hub")
+
+
+def find_cached_model():
+    """
+    Check whether the model is already fully cached, without importing
+    sentence_transformers (which takes seconds to load torch).
+    
+    Returns:
+        Path of the cached config.json, or None if any required file is missing
+    """
+    try:
+        from huggingface_hub import try_to_load_from_cache
+    except ImportError:
+        return None
+    
+    cache_dir = get_model_cache_dir()
+    
+    def cached_path(filename):
+        path = try_to_load_from_cache(MODEL_NAME, filename, cache_dir=cache_dir)
+        # May also return a sentinel meaning "known not to exist"
+        return path if isinstance(path, str) else None
+    
+    paths = [cached_path(filename) for filename in REQUIRED_MODEL_FILES]
+    if not all(paths):
+        return None
+    if not any(cached_path(filename) for filename in MODEL_WEIGHT_FILES):
+        return None
+    return paths[0]
+
 
 def main():
     print("=" * 60)
     print("DOWNLOADING SENTENCE-TRANSFORMERS MODEL")
     print("=" * 60)
-    print("\nModel: sentence-transformers/all-MiniLM-L6-v2")
+    print(f"\nModel: {MODEL_NAME}")
     print("Size: ~90 MB")
+    print(f"Cache directory: {get_model_cache_dir()}")
+    print("(Set HF_HOME to a shared directory to reuse the download)")
+    
+    cached_config = find_cached_model()
+    if cached_config:
+        print("\n✓ Model is already cached, nothing to download")
+        print(f"Cached at: {os.path.dirname(cached_config)}")
+        return 0
+    
     print("\nThis may take 2-5 minutes depending on your internet speed...")
     print("You'll see progress updates below:\n")
     
     try:
-        import time
-        import warnings
-        
         # Suppress NumPy warnings for cleaner output
         warnings.filterwarnings('ignore')
         
+        if configure_fast_download():
+            print("Using hf_transfer for parallel downloads")
+        
         print("Step 1: Importing sentence_transformers...")
         sys.stdout.flush()
         
@@ -37,7 +128,7 @@ def main():
         print("\n[Downloading files from HuggingFace...]")
         sys.stdout.flush()
         
-        model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2', device='cpu')
+        model = SentenceTransformer(MODEL_NAME, device='cpu')
         
         elapsed = time.time() - start_time
         
@@ -4,12 +4,138 @@ Implements bias detection, content filtering, privacy protection, and safety mea
 """
 
 import re
+import hashlib
 import logging
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Pattern
+
+from pattern_set import PatternSet
+from response_cache import LRUCache
 
 logger = logging.getLogger(__name__)
 
 
+# Sensitive patterns to detect
+SENSITIVE_PATTERNS = {
+    'api_keys': (
+        r'(?i)(api[_-]?key|apikey)\s*[:=]\s*["\']?([a-zA-Z0-9_-]+)["\']?',
+        r'(?i)(secret[_-]?key|secretkey)\s*[:=]\s*["\']?([a-zA-Z0-9_-]+)["\']?',
+        r'(?i)(access[_-]?token)\s*[:=]\s*["\']?([a-zA-Z0-9_-]+)["\']?'
+    ),
+    'credentials': (
+        r'(?i)(password|passwd|pwd)\s*[:=]\s*["\']?([^\s"\']+)["\']?',
+        r'(?i)(username|user)\s*[:=]\s*["\']?([^\s"\']+)["\']?',
+        r'(?i)(email)\s*[:=]\s*["\']?([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})["\']?'
+    ),
+    'personal_info': (
+        r'\b\d{3}-\d{2}-\d{4}\b',  # SSN
+        r'\b\d{16}\b',  # Credit card
+        r'\b(?:\+?1[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}\b'  # Phone
+    )
+}
+
+# Bias-related terms to flag
+BIAS_INDICATORS = (
+    'gender', 'race', 'age', 'religion', 'ethnicity',
+    'disability', 'nationality', 'sexual orientation'
+)
+
+# Response validation markers (stored lowercase for direct matching)
+INCOMPLETE_MARKERS = (
+    '...', '[truncated]', '[error]', 'i apologize, but'
+)
+HARMFUL_KEYWORDS = (
+    'hack', 'exploit', 'bypass security', 'steal',
+    'unauthorized access', 'malicious'
+)
+
+# Malicious code patterns
+MALICIOUS_PATTERNS = (
+    r'(?i)(rm\s+-rf|rmdir\s+/s)',  # Dangerous deletion
+    r'(?i)(eval|exec)\s*\(',  # Code execution
+    r'(?i)(__import__|subprocess|os\.system)',  # System access
+    r'(?i)(DROP\s+TABLE|DELETE\s+FROM)',  # SQL injection
+    r'(?i)(<script|javascript:)',  # XSS
+)
+
+# Precompiled at import so every guard (and worker process) shares them
+_SENSITIVE_COMPILED: Dict[str, Tuple[Pattern, ...]] = {
+    category: tuple(re.compile(p) for p in patterns)
+    for category, patterns in SENSITIVE_PATTERNS.items()
+}
+_MALICIOUS_SET = PatternSet(MALICIOUS_PATTERNS)
+
+# ASCII-mode variants skip Unicode class and case-folding tables (~1.7x
+# faster). On ASCII input they match exactly like the Unicode patterns,
+# except that Unicode \s also covers \x1c-\x1f, so those inputs are excluded
+_SENSITIVE_COMPILED_ASCII: Dict[str, Tuple[Pattern, ...]] = {
+    category: tuple(re.compile(p, re.ASCII) for p in patterns)
+    for category, patterns in SENSITIVE_PATTERNS.items()
+}
+_UNICODE_ONLY_SPACE = re.compile(r'[\x1c-\x1f]')
+
+# The case-insensitive malicious patterns, lowercased, for matching against
+# lowercased ASCII code. Without IGNORECASE, re can scan for each pattern's
+# literal prefix directly, which is ~3x faster; for ASCII text, lowercasing
+# folds exactly what ASCII IGNORECASE would. (No pattern uses an uppercase
+# escape such as \S, whose meaning lowercasing would change.)
+_MALICIOUS_SET_ASCII_LOWER = PatternSet(
+    [pattern.replace('(?i)', '', 1).lower() for pattern in MALICIOUS_PATTERNS],
+    re.ASCII
+)
+
+# Comment line starts: Python (#), JavaScript/Java/C++ (//), block (/*)
+_COMMENT_PREFIXES = ('#', '//', '/*')
+_MEANINGFUL_NAME = re.compile(r'\b[a-z][a-zA-Z]{4,}\b')
+_FUNCTION_DEFINITION = re.compile(r'def |function |func ')
+
+# Every sensitive pattern needs a ':' or '=' (key/value) or a digit (PII),
+# so inputs without them can skip the sensitive scan entirely
+_ANY_DIGIT = re.compile(r'\d')
+
+# Text shorter than every bias indicator cannot contain one
+_SHORTEST_BIAS_INDICATOR = min(len(indicator) for indicator in BIAS_INDICATORS)
+
+# Sanitized results kept for repeated code (re-runs, validate-code followed by
+# explain); hashing 10 KB of code is ~100x cheaper than scanning it
+SANITIZE_CACHE_SIZE = 1024
+
+
+def _mask_match(match) -> str:
+    """Replace a sensitive match, keeping its key name when one is captured."""
+    if match.re.groups:
+        return f"{match.group(1)}='***REDACTED***'"
+    return "***REDACTED***"
+
+
+def _is_word_char(char: str) -> bool:
+    """Return True for characters regex \\w treats as part of a word."""
+    return char.isalnum() or char == '_'
+
+
+def _contains_word(haystack: str, word: str) -> bool:
+    """
+    Check whether word occurs in haystack on word boundaries (like \\bword\\b).
+    
+    Args:
+        haystack: Lowercased text to search
+        word: Lowercased plain word or phrase
+        
+    Returns:
+        True if a whole-word occurrence exists
+    """
+    end_offset = len(word)
+    index = haystack.find(word)
+    while index != -1:
+        end = index + end_offset
+        if (
+            (index == 0 or not _is_word_char(haystack[index - 1]))
+            and (end == len(haystack) or not _is_word_char(haystack[end]))
+        ):
+            return True
+        index = haystack.find(word, index + 1)
+    return False
+
+
 class EthicalAIGuard:
     """
     Implement ethical AI safeguards including:
@@ -20,78 +146,75 @@ class EthicalAIGuard:
     - Response validation
     """
     
+    # Pattern tables, shared read-only by every instance
+    sensitive_patterns = SENSITIVE_PATTERNS
+    bias_indicators = BIAS_INDICATORS
+    incomplete_markers = INCOMPLETE_MARKERS
+    harmful_keywords = HARMFUL_KEYWORDS
+    malicious_patterns = MALICIOUS_PATTERNS
+    
     def __init__(self):
-        """Initialize ethical AI safeguards."""
-        # Sensitive patterns to detect
-        self.sensitive_patterns = {
-            'api_keys': [
-                r'(?i)(api[_-]?key|apikey)\s*[:=]\s*["\']?([a-zA-Z0-9_-]+)["\']?',
-                r'(?i)(secret[_-]?key|secretkey)\s*[:=]\s*["\']?([a-zA-Z0-9_-]+)["\']?',
-                r'(?i)(access[_-]?token)\s*[:=]\s*["\']?([a-zA-Z0-9_-]+)["\']?'
-            ],
-            'credentials': [
-                r'(?i)(password|passwd|pwd)\s*[:=]\s*["\']?([^\s"\']+)["\']?',
-                r'(?i)(username|user)\s*[:=]\s*["\']?([^\s"\']+)["\']?',
-                r'(?i)(email)\s*[:=]\s*["\']?([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})["\']?'
-            ],
-            'personal_info': [
-                r'\b\d{3}-\d{2}-\d{4}\b',  # SSN
-                r'\b\d{16}\b',  # Credit card
-                r'\b(?:\+?1[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}\b'  # Phone
-            ]
-        }
-        
-        # Bias-related terms to flag
-        self.bias_indicators = [
-            'gender', 'race', 'age', 'religion', 'ethnicity',
-            'disability', 'nationality', 'sexual orientation'
-        ]
-        
-        # Malicious code patterns
-        self.malicious_patterns = [
-            r'(?i)(rm\s+-rf|rmdir\s+/s)',  # Dangerous deletion
-            r'(?i)(eval|exec)\s*\(',  # Code execution
-            r'(?i)(__import__|subprocess|os\.system)',  # System access
-            r'(?i)(DROP\s+TABLE|DELETE\s+FROM)',  # SQL injection
-            r'(?i)(<script|javascript:)',  # XSS
-        ]
-        
-        logger.info("Ethical AI safeguards initialized")
+        # Keyed by a digest of the code to avoid holding large inputs twice
+        self._sanitize_cache = LRUCache(SANITIZE_CACHE_SIZE)
     
     def sanitize_code(self, code: str) -> Tuple[str, List[str]]:
         """
         Sanitize code input by detecting and masking sensitive information.
         
+        Results are cached, so sanitizing the same code again is a lookup.
+        
         Args:
             code: Input code string
             
         Returns:
             Tuple of (sanitized_code, list_of_warnings)
         """
+        # Fast path: blank input cannot match any pattern
+        if not code or code.isspace():
+            return code, []
+        
+        cache_key = hashlib.blake2b(
+            code.encode("utf-8", "surrogatepass"),
+            digest_size=16
+        ).digest()
+        cached = self._sanitize_cache.get(cache_key)
+        if cached is None:
+            cached = self._scan_code(code)
+            self._sanitize_cache.set(cache_key, cached)
+        
+        sanitized, warnings = cached
+        return sanitized, list(warnings)
+    
+    def _scan_code(self, code: str) -> Tuple[str, Tuple[str, ...]]:
+        """Mask sensitive information and flag malicious patterns in code."""
         warnings = []
         sanitized = code
         
-        # Check for sensitive information
-        for category, patterns in self.sensitive_patterns.items():
-            for pattern in patterns:
-                matches = re.findall(pattern, sanitized)
-                if matches:
-                    # Mask sensitive values
-                    sanitized = re.sub(
-                        pattern,
-                        lambda m: f"{m.group(1)}='***REDACTED***'",
-                        sanitized
-                    )
-                    warnings.append(
-                        f"⚠️ Detected {category}: Sensitive information masked"
-                    )
-                    logger.warning(f"Sensitive {category} detected and masked")
+        if code.isascii() and not _UNICODE_ONLY_SPACE.search(code):
+            sensitive_compiled = _SENSITIVE_COMPILED_ASCII
+            malicious_set = _MALICIOUS_SET_ASCII_LOWER
+            malicious_text = code.lower()
+        else:
+            sensitive_compiled = _SENSITIVE_COMPILED
+            malicious_set = _MALICIOUS_SET
+            malicious_text = code
+        
+        # Check for and mask sensitive information (one pass per pattern)
+        if ':' in code or '=' in code or _ANY_DIGIT.search(code):
+            for category, patterns in sensitive_compiled.items():
+                for pattern in patterns:
+                    sanitized, count = pattern.subn(_mask_match, sanitized)
+                    if count:
+                        warnings.append(
+                            f"⚠️ Detected {category}: Sensitive information masked"
+                        )
+                        logger.warning(f"Sensitive {category} detected and masked")
         
         # Check for malicious patterns
-        malicious_found = []
-        for pattern in self.malicious_patterns:
-            if re.search(pattern, code):
-                malicious_found.append(pattern)
+        malicious_found = [
+            MALICIOUS_PATTERNS[i]
+            for i in sorted(malicious_set.matches(malicious_text))
+        ]
         
         if malicious_found:
             warnings.append(
@@ -100,7 +223,7 @@ class EthicalAIGuard:
             )
             logger.warning(f"Malicious patterns detected: {malicious_found}")
         
-        return sanitized, warnings
+        return sanitized, tuple(warnings)
     
     def check_bias(self, text: str) -> Dict:
         """
@@ -112,11 +235,14 @@ class EthicalAIGuard:
         Returns:
             Dictionary with bias analysis results
         """
+        # Indicators are plain lowercase words, so substring search suffices
         found_indicators = []
-        
-        for indicator in self.bias_indicators:
-            if re.search(rf'\b{indicator}\b', text, re.IGNORECASE):
-                found_indicators.append(indicator)
+        if len(text) >= _SHORTEST_BIAS_INDICATOR:
+            text_lower = text.lower()
+            found_indicators = [
+                indicator for indicator in BIAS_INDICATORS
+                if _contains_word(text_lower, indicator)
+            ]
         
         has_bias_risk = len(found_indicators) > 0
         
@@ -150,23 +276,22 @@ class EthicalAIGuard:
         if len(response.strip()) < 50:
             return False, "Response too short"
         
+        # Lowercase once and reuse for every marker/keyword test
+        response_lower = response.lower()
+        
         # Check for incomplete responses
-        incomplete_markers = [
-            '...', '[truncated]', '[error]', 'I apologize, but'
-        ]
-        for marker in incomplete_markers:
-            if marker.lower() in response.lower()[-100:]:
+        tail = response_lower[-100:]
+        for marker in INCOMPLETE_MARKERS:
+            if marker in tail:
                 return False, "Response appears incomplete"
         
-        # Check for harmful content
-        harmful_keywords = [
-            'hack', 'exploit', 'bypass security', 'steal',
-            'unauthorized access', 'malicious'
-        ]
-        harmful_found = sum(
-            1 for keyword in harmful_keywords
-            if keyword in response.lower()
-        )
+        # Check for harmful content (stop as soon as two keywords are found)
+        harmful_found = 0
+        for keyword in HARMFUL_KEYWORDS:
+            if keyword in response_lower:
+                harmful_found += 1
+                if harmful_found >= 2:
+                    break
         if harmful_found >= 2:
             logger.warning("Response contains potentially harmful content")
             return False, "Response contains potentially harmful guidance"
@@ -218,23 +343,21 @@ class EthicalAIGuard:
         Returns:
             Dictionary with quality metrics
         """
-        lines = code.split('\n')
-        non_empty_lines = [l for l in lines if l.strip()]
-        
-        # Count comments
-        comment_patterns = [
-            r'^\s*#',  # Python
-            r'^\s*//',  # JavaScript, Java, C++
-            r'^\s*/\*',  # Block comments
-        ]
-        comment_lines = sum(
-            1 for line in lines
-            if any(re.match(p, line) for p in comment_patterns)
-        )
+        # Classify lines in a single pass
+        total_lines = 0
+        code_lines = 0
+        comment_lines = 0
+        
+        for line in code.split('\n'):
+            total_lines += 1
+            stripped = line.lstrip()
+            if not stripped:
+                continue
+            code_lines += 1
+            if stripped.startswith(_COMMENT_PREFIXES):
+                comment_lines += 1
         
         # Calculate metrics
-        total_lines = len(lines)
-        code_lines = len(non_empty_lines)
         comment_ratio = (
             (comment_lines / code_lines * 100)
             if code_lines > 0 else 0
@@ -242,10 +365,10 @@ class EthicalAIGuard:
         
         # Check for best practices
         has_meaningful_names = bool(
-            re.search(r'\b[a-z][a-zA-Z]{4,}\b', code)
+            _MEANINGFUL_NAME.search(code)
         )
         has_functions = bool(
-            re.search(r'def |function |func ', code)
+            _FUNCTION_DEFINITION.search(code)
         )
         
         quality_score = 50  # Base score
@@ -269,6 +392,26 @@ class EthicalAIGuard:
             )
         }
     
+    def analyze_code(self, code: str) -> Dict:
+        """
+        Run every code safety check on one input.
+        
+        The checks run sequentially: they are CPU-bound regex/string scans
+        that hold the GIL, so a thread pool does not shorten them.
+        
+        Args:
+            code: Code to analyze
+            
+        Returns:
+            Dictionary with keys 'sanitize' ((sanitized_code, warnings)),
+            'bias' (check_bias result) and 'quality' (check_code_quality result)
+        """
+        return {
+            'sanitize': self.sanitize_code(code),
+            'bias': self.check_bias(code),
+            'quality': self.check_code_quality(code)
+        }
+    
     def _get_quality_suggestions(
         self,
         comment_ratio: float,
@@ -297,13 +440,10 @@ class EthicalAIGuard:
         return suggestions
 
 
-# Global instance
-_guard = None
+# Global instance (cheap to build, so it is created eagerly at import)
+_guard = EthicalAIGuard()
 
 
 def get_ethical_guard() -> EthicalAIGuard:
-    """Get or create global ethical AI guard instance."""
-    global _guard
-    if _guard is None:
-        _guard = EthicalAIGuard()
+    """Get the global ethical AI guard instance."""
     return _guard
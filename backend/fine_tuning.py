@@ -4,7 +4,12 @@ Implements logical fine-tuning through prompt engineering and few-shot learning
 """
 
 import re
-from typing import List, Dict, Optional
+from collections import Counter
+from functools import lru_cache
+from itertools import islice
+from typing import List, Dict, Optional, Tuple
+
+from pattern_set import PatternSet
 
 
 # System prompt for domain-specific code explanation
@@ -232,6 +237,41 @@ Implements an LRU (Least Recently Used) cache with fixed capacity that evicts le
 ]
 
 
+def _group_examples_by_language() -> Dict[str, List[Dict]]:
+    """Bucket FEW_SHOT_EXAMPLES by language, preserving their order."""
+    buckets: Dict[str, List[Dict]] = {}
+    for example in FEW_SHOT_EXAMPLES:
+        buckets.setdefault(example['language'], []).append(example)
+    return buckets
+
+
+_EXAMPLES_BY_LANGUAGE = _group_examples_by_language()
+
+
+def _render_example_body(example: Dict) -> str:
+    """Format an example's code and explanation for a few-shot prompt."""
+    return (
+        f"Code:\n```{example['language']}\n{example['code']}\n```\n\n"
+        f"Explanation:\n{example['explanation']}"
+    )
+
+
+# Examples are immutable, so render each code/explanation block once
+_RENDERED_EXAMPLE_BODIES: Dict[int, str] = {
+    id(example): _render_example_body(example) for example in FEW_SHOT_EXAMPLES
+}
+
+
+# Static head of every few-shot prompt
+_FEW_SHOT_PROMPT_PREFIX = f"""{SYSTEM_PROMPT}
+
+{OUTPUT_FORMAT}
+
+Here are examples of high-quality code explanations:
+
+"""
+
+
 # Language detection patterns
 LANGUAGE_PATTERNS = {
     "python": [r"def\s+\w+\(", r"import\s+\w+", r":\s*$", r"elif\s+", r"print\("],
@@ -245,56 +285,85 @@ LANGUAGE_PATTERNS = {
 }
 
 
+def _compile_language_patterns() -> Tuple[PatternSet, List[Tuple[str, ...]]]:
+    """
+    Compile LANGUAGE_PATTERNS once into a PatternSet, merging patterns shared
+    by several languages (e.g. C and C++) so each is matched only once.
+    
+    Returns:
+        Tuple of (pattern set, languages each pattern index scores for)
+    """
+    pattern_languages: Dict[str, List[str]] = {}
+    for language, patterns in LANGUAGE_PATTERNS.items():
+        for pattern in patterns:
+            pattern_languages.setdefault(pattern, []).append(language)
+    
+    pattern_set = PatternSet(list(pattern_languages), re.MULTILINE | re.IGNORECASE)
+    return pattern_set, [tuple(languages) for languages in pattern_languages.values()]
+
+
+_LANGUAGE_PATTERN_SET, _PATTERN_LANGUAGES = _compile_language_patterns()
+
+
+@lru_cache(maxsize=512)
 def detect_language(code: str) -> str:
     """
     Detect programming language from code syntax.
     
+    Results are memoized per code string, so repeated requests for the same
+    snippet (and the repeated calls within one prompt build) skip the scan.
+    
     Args:
         code: Source code string
         
     Returns:
         Detected language name or 'unknown'
     """
-    code_lower = code.lower()
-    scores = {}
+    scores = Counter()
     
-    for language, patterns in LANGUAGE_PATTERNS.items():
-        score = sum(1 for pattern in patterns if re.search(pattern, code, re.MULTILINE | re.IGNORECASE))
-        if score > 0:
-            scores[language] = score
+    for index in _LANGUAGE_PATTERN_SET.matches(code):
+        scores.update(_PATTERN_LANGUAGES[index])
     
     if not scores:
         return "unknown"
     
-    # Return language with highest score
-    return max(scores.items(), key=lambda x: x[1])[0]
+    # Return language with highest score (ties go to the first listed language)
+    return max(LANGUAGE_PATTERNS, key=lambda language: scores[language])
 
 
-def select_relevant_examples(code: str, num_examples: int = 2) -> List[Dict]:
+def select_relevant_examples(
+    code: str,
+    num_examples: int = 2,
+    language: Optional[str] = None
+) -> List[Dict]:
     """
     Select few-shot examples most relevant to the input code.
     
     Args:
         code: User's code to explain
         num_examples: Number of examples to return
+        language: Already-detected language of the code (detected if omitted)
         
     Returns:
         List of relevant example dictionaries
     """
+    if num_examples <= 0:
+        return []
+    
     # Detect language of input code
-    language = detect_language(code)
+    if language is None:
+        language = detect_language(code)
     
     # Prioritize same-language examples
-    same_language = [ex for ex in FEW_SHOT_EXAMPLES if ex['language'] == language]
-    other_language = [ex for ex in FEW_SHOT_EXAMPLES if ex['language'] != language]
-    
-    # Combine: prefer same language, fallback to others
-    selected = same_language[:num_examples]
+    selected = _EXAMPLES_BY_LANGUAGE.get(language, [])[:num_examples]
     
-    if len(selected) < num_examples:
-        selected.extend(other_language[:num_examples - len(selected)])
+    # Fall back to other languages, in their original order
+    remaining = num_examples - len(selected)
+    if remaining > 0:
+        other_language = (ex for ex in FEW_SHOT_EXAMPLES if ex['language'] != language)
+        selected.extend(islice(other_language, remaining))
     
-    return selected[:num_examples]
+    return selected
 
 
 def build_few_shot_prompt(code: str, num_examples: int = 2) -> str:
@@ -308,23 +377,18 @@ def build_few_shot_prompt(code: str, num_examples: int = 2) -> str:
     Returns:
         Complete prompt string with examples
     """
-    examples = select_relevant_examples(code, num_examples)
     language = detect_language(code)
+    examples = select_relevant_examples(code, num_examples, language=language)
     
     # Build few-shot section
-    few_shot_text = "\n\n".join([
-        f"Example {i+1}:\n\nCode:\n```{ex['language']}\n{ex['code']}\n```\n\nExplanation:\n{ex['explanation']}"
+    few_shot_text = "\n\n".join(
+        f"Example {i+1}:\n\n"
+        f"{_RENDERED_EXAMPLE_BODIES.get(id(ex)) or _render_example_body(ex)}"
         for i, ex in enumerate(examples)
-    ])
+    )
     
     # Construct complete prompt
-    prompt = f"""{SYSTEM_PROMPT}
-
-{OUTPUT_FORMAT}
-
-Here are examples of high-quality code explanations:
-
-{few_shot_text}
+    prompt = _FEW_SHOT_PROMPT_PREFIX + f"""{few_shot_text}
 
 Now, explain the following code in a similar comprehensive style:
 
@@ -354,11 +418,14 @@ def validate_explanation_quality(explanation: str) -> Dict:
         "## Key Concepts"
     ]
     
+    # Scan for each required section once; reused for missing_sections
+    section_present = [section in explanation for section in required_sections]
+    
     quality_metrics = {
-        "has_overview": "## Overview" in explanation,
-        "has_breakdown": "## Detailed Breakdown" in explanation,
-        "has_complexity": "## Complexity Analysis" in explanation,
-        "has_concepts": "## Key Concepts" in explanation,
+        "has_overview": section_present[0],
+        "has_breakdown": section_present[1],
+        "has_complexity": section_present[2],
+        "has_concepts": section_present[3],
         "has_improvements": "## Best Practices" in explanation or "## Improvements" in explanation,
         "length_adequate": len(explanation) > 300,
         "has_code_references": "`" in explanation,
@@ -371,7 +438,10 @@ def validate_explanation_quality(explanation: str) -> Dict:
         "valid": score >= 0.75,  # At least 75% of metrics met
         "score": score,
         "metrics": quality_metrics,
-        "missing_sections": [section for section in required_sections if section not in explanation]
+        "missing_sections": [
+            section for section, present in zip(required_sections, section_present)
+            if not present
+        ]
     }
 
 
@@ -4,33 +4,101 @@ Handles communication with LLaMA 3.3 70B Versatile model via Groq API
 """
 
 import os
-from groq import Groq
+import json
+import time
+import asyncio
+import hashlib
+import importlib.util
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Tuple
+import httpx
+from groq import AsyncGroq
 from dotenv import load_dotenv
 
+from rate_limiter import TokenBucket
+from response_cache import LRUCache, SingleFlight
+
 # Load environment variables
 load_dotenv()
 
-# Initialize Groq client
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-
 # Model configuration
 MODEL_NAME = "llama-3.3-70b-versatile"
 MAX_TOKENS = 2048
 TEMPERATURE = 0.7
 TIMEOUT = 30  # seconds
 
+# Groq rate limits (requests and tokens per minute; 0 disables the limit).
+# Defaults match the free tier; raise them to match your plan.
+RPM_LIMIT = int(os.getenv("GROQ_RPM_LIMIT", "30"))
+TPM_LIMIT = int(os.getenv("GROQ_TPM_LIMIT", "6000"))
+CHARS_PER_TOKEN = 4  # Rough estimate used to debit prompts against TPM_LIMIT
 
-def create_explanation_prompt(code: str) -> str:
+_request_bucket = TokenBucket(RPM_LIMIT) if RPM_LIMIT > 0 else None
+_token_bucket = TokenBucket(TPM_LIMIT) if TPM_LIMIT > 0 else None
+
+# Groq calls allowed in flight at once, across all endpoints. Further calls
+# queue here, holding little memory, instead of piling onto the connection
+# pool and into Groq's rate limiter during a burst.
+MAX_CONCURRENT_CALLS = int(os.getenv("GROQ_MAX_CONCURRENT_CALLS", "32"))
+_call_slots = asyncio.Semaphore(MAX_CONCURRENT_CALLS)
+
+# Successful explanations, keyed by a hash of the full request (0 disables)
+EXPLANATION_CACHE_SIZE = int(os.getenv("EXPLANATION_CACHE_SIZE", "2048"))
+_explanation_cache = LRUCache(EXPLANATION_CACHE_SIZE)
+
+# Groq calls in progress, keyed like the cache; concurrent identical
+# requests share one call instead of each making their own
+_inflight_explanations = SingleFlight()
+
+# Connection pool for the async client. Idle connections are kept for five
+# minutes (httpx closes them after 5 seconds by default) so requests reuse a
+# warm TLS connection; HTTP/2 multiplexing is used when h2 is installed.
+# Every pooled connection may stay alive, so a burst that opened them all
+# doesn't have to reconnect (and redo the TLS handshake) for the next burst.
+MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "64"))
+HTTP_LIMITS = httpx.Limits(
+    max_connections=MAX_CONNECTIONS,
+    max_keepalive_connections=MAX_CONNECTIONS,
+    keepalive_expiry=300
+)
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Groq client (created on first use)
+_async_client = None
+
+
+def get_async_client() -> AsyncGroq:
     """
-    Creates a structured prompt for the LLM to explain code.
+    Get or create the shared async Groq client.
     
-    Args:
-        code: The code snippet to explain
-        
-    Returns:
-        Formatted prompt string
+    Explanation requests await this client so the event loop keeps serving
+    other requests while a completion is generated.
     """
-    prompt = f"""You are an expert programming instructor. Analyze the following code and provide a clear, comprehensive explanation.
+    global _async_client
+    if _async_client is None:
+        http_client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            timeout=TIMEOUT,
+            limits=HTTP_LIMITS
+        )
+        _async_client = AsyncGroq(
+            api_key=os.getenv("GROQ_API_KEY"),
+            http_client=http_client
+        )
+    return _async_client
+
+
+async def close_async_client() -> None:
+    """Close the shared async Groq client and its connection pool."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+
+
+# Fixed instructions around the code in a basic explanation prompt. Keeping
+# them constant gives every prompt an identical prefix.
+EXPLANATION_PROMPT_PREFIX = """You are an expert programming instructor. Analyze the following code and provide a clear, comprehensive explanation.
 
 Your explanation should include:
 1. **Overview**: What does this code do? (1-2 sentences)
@@ -44,12 +112,233 @@ Your explanation should include:
 
 Code to explain:
 ```
-{code}
+"""
+EXPLANATION_PROMPT_SUFFIX = """
 ```
 
 Provide a well-structured, educational explanation that helps the reader understand both what the code does and why it's written this way."""
+
+
+def create_explanation_prompt(code: str) -> str:
+    """
+    Creates a structured prompt for the LLM to explain code.
+    
+    Args:
+        code: The code snippet to explain
+        
+    Returns:
+        Formatted prompt string
+    """
+    return EXPLANATION_PROMPT_PREFIX + code + EXPLANATION_PROMPT_SUFFIX
+
+
+def truncate_code(code: str, max_tokens: int) -> str:
+    """
+    Shorten code to roughly max_tokens by keeping its beginning and end.
+    
+    Whole lines are kept from the top and bottom (half the budget each) and
+    the middle is replaced by a marker saying how much was left out. Token
+    counts are estimated at CHARS_PER_TOKEN characters per token.
+    
+    Args:
+        code: The code snippet to shorten
+        max_tokens: Approximate token budget for the code
+        
+    Returns:
+        The code unchanged if it fits, otherwise the shortened code
+    """
+    budget = max_tokens * CHARS_PER_TOKEN
+    if len(code) <= budget:
+        return code
+    
+    half = budget // 2
+    lines = code.split('\n')
+    
+    head, used = [], 0
+    for line in lines:
+        used += len(line) + 1
+        if used > half:
+            break
+        head.append(line)
+    
+    tail, used = [], 0
+    for line in reversed(lines[len(head):]):
+        used += len(line) + 1
+        if used > half:
+            break
+        tail.append(line)
+    tail.reverse()
+    
+    if not head and not tail:
+        # A few very long lines (e.g. minified code): cut by characters instead
+        omitted = len(code) - 2 * half
+        return f"{code[:half]}\n... ({omitted} characters omitted) ...\n{code[-half:]}"
+    
+    omitted = len(lines) - len(head) - len(tail)
+    return '\n'.join(head + [f"... ({omitted} lines omitted) ..."] + tail)
+
+
+SYSTEM_MESSAGE = "You are an expert programming instructor who provides clear, accurate, and educational code explanations."
+RAG_SYSTEM_MESSAGE = "You are an expert programming instructor with deep knowledge across multiple languages and paradigms. Provide clear, accurate, and educational code explanations using the context and examples provided."
+
+
+def _validate_code(code: str) -> Optional[str]:
+    """
+    Check that a code explanation request can be sent.
+    
+    Args:
+        code: The code snippet to explain
+        
+    Returns:
+        Error message, or None if the request is valid
+    """
+    if not code or not code.strip():
+        return "No code provided. Please paste code to explain."
+    
+    if len(code) > 10000:
+        return "Code is too long. Please provide a snippet under 10,000 characters."
+    
+    if not os.getenv("GROQ_API_KEY"):
+        return "GROQ_API_KEY not configured. Please check your .env file."
+    
+    return None
+
+
+def _build_completion_args(code: str, custom_prompt: Optional[str], use_rag: bool) -> dict:
+    """
+    Build the chat completion arguments for an explanation request.
+    
+    Args:
+        code: The code snippet to explain
+        custom_prompt: Optional custom prompt (used for RAG-enhanced mode)
+        use_rag: Whether this is a RAG-enhanced request (affects prompting)
+        
+    Returns:
+        Keyword arguments for client.chat.completions.create
+    """
+    # Create prompt (use custom prompt for RAG mode, default for basic mode)
+    if custom_prompt:
+        prompt = custom_prompt
+        system_message = RAG_SYSTEM_MESSAGE
+    else:
+        prompt = create_explanation_prompt(code)
+        system_message = SYSTEM_MESSAGE
+    
+    return {
+        "messages": [
+            {
+                "role": "system",
+                "content": system_message
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        "model": MODEL_NAME,
+        "temperature": TEMPERATURE if not use_rag else 0.6,  # Slightly lower temperature for RAG
+        "max_tokens": MAX_TOKENS,
+        "timeout": TIMEOUT,
+        "top_p": 1
+    }
+
+
+async def _wait_for_rate_limit(completion_args: dict) -> None:
+    """
+    Pace a chat completion call below the Groq request and token limits.
+    
+    Waiting here is cheaper than sending a request that will be rejected
+    with a rate limit error.
+    
+    Args:
+        completion_args: Arguments from _build_completion_args
+    """
+    if _request_bucket is not None:
+        await _request_bucket.acquire()
+    if _token_bucket is not None:
+        prompt_chars = sum(len(message["content"]) for message in completion_args["messages"])
+        await _token_bucket.acquire(prompt_chars // CHARS_PER_TOKEN)
+
+
+@asynccontextmanager
+async def _groq_call_slot(completion_args: dict) -> AsyncIterator[float]:
+    """
+    Hold one of the MAX_CONCURRENT_CALLS slots for a Groq call, after pacing
+    it below the rate limits.
+    
+    Args:
+        completion_args: Arguments from _build_completion_args
+        
+    Yields:
+        Seconds spent queued for the slot and the rate limits
+    """
+    queued_at = time.perf_counter()
+    async with _call_slots:
+        await _wait_for_rate_limit(completion_args)
+        yield time.perf_counter() - queued_at
+
+
+def clear_explanation_cache() -> None:
+    """Forget cached explanations, e.g. before measuring API latency."""
+    _explanation_cache.clear()
+
+
+def _cache_key(completion_args: dict) -> str:
+    """
+    Hash everything that determines a completion's output.
+    
+    Args:
+        completion_args: Arguments from _build_completion_args
+        
+    Returns:
+        Hex digest identifying the request
+    """
+    payload = json.dumps(
+        [
+            completion_args["model"],
+            completion_args["temperature"],
+            completion_args["max_tokens"],
+            completion_args["top_p"],
+            completion_args["messages"]
+        ]
+    )
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _describe_error(error: Exception) -> str:
+    """Turn a Groq API exception into a user-facing error message."""
+    error_message = str(error)
+    
+    # Handle specific error cases
+    if "api_key" in error_message.lower():
+        return "Invalid API key. Please check your GROQ_API_KEY in .env file."
+    elif "timeout" in error_message.lower():
+        return "Request timed out. Please try again with a smaller code snippet."
+    elif "rate_limit" in error_message.lower():
+        return "Rate limit exceeded. Please wait a moment and try again."
+    return f"Error communicating with AI service: {error_message}"
+
+
+async def _fetch_explanation(completion_args: dict, cache_key: str) -> Tuple[str, float]:
+    """
+    Call Groq for a complete (non-streamed) explanation and cache it.
+    
+    Args:
+        completion_args: Arguments from _build_completion_args
+        cache_key: Cache key for completion_args
+        
+    Returns:
+        Tuple of (explanation text, seconds queued before the call)
+    """
+    async with _groq_call_slot(completion_args) as queue_wait:
+        chat_completion = await get_async_client().chat.completions.create(
+            **completion_args,
+            stream=False
+        )
     
-    return prompt
+    explanation = chat_completion.choices[0].message.content.strip()
+    _explanation_cache.set(cache_key, explanation)
+    return explanation, queue_wait
 
 
 async def get_code_explanation(code: str, custom_prompt: str = None, use_rag: bool = False) -> dict:
@@ -66,106 +355,113 @@ async def get_code_explanation(code: str, custom_prompt: str = None, use_rag: bo
         {
             "success": bool,
             "explanation": str,
+            "queue_wait": float (seconds queued before the Groq call),
             "error": str (optional)
         }
     """
     try:
-        # Validate input
-        if not code or not code.strip():
-            return {
-                "success": False,
-                "error": "No code provided. Please paste code to explain."
-            }
-        
-        if len(code) > 10000:
+        # Validate input and API key
+        error = _validate_code(code)
+        if error:
             return {
                 "success": False,
-                "error": "Code is too long. Please provide a snippet under 10,000 characters."
+                "error": error
             }
         
-        # Check API key
-        if not os.getenv("GROQ_API_KEY"):
-            return {
-                "success": False,
-                "error": "GROQ_API_KEY not configured. Please check your .env file."
-            }
+        completion_args = _build_completion_args(code, custom_prompt, use_rag)
+        cache_key = _cache_key(completion_args)
         
-        # Create prompt (use custom prompt for RAG mode, default for basic mode)
-        if custom_prompt:
-            prompt = custom_prompt
-            system_message = "You are an expert programming instructor with deep knowledge across multiple languages and paradigms. Provide clear, accurate, and educational code explanations using the context and examples provided."
-        else:
-            prompt = create_explanation_prompt(code)
-            system_message = "You are an expert programming instructor who provides clear, accurate, and educational code explanations."
-        
-        # Call Groq API
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": system_message
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            model=MODEL_NAME,
-            temperature=TEMPERATURE if not use_rag else 0.6,  # Slightly lower temperature for RAG
-            max_tokens=MAX_TOKENS,
-            timeout=TIMEOUT,
-            top_p=1,
-            stream=False
-        )
-        
-        # Extract explanation
-        explanation = chat_completion.choices[0].message.content
+        queue_wait = 0.0
+        explanation = _explanation_cache.get(cache_key)
+        if explanation is None:
+            # Concurrent identical requests share the first one's Groq call
+            explanation, queue_wait = await _inflight_explanations.run(
+                cache_key,
+                lambda: _fetch_explanation(completion_args, cache_key)
+            )
         
         return {
             "success": True,
-            "explanation": explanation.strip()
+            "explanation": explanation,
+            "queue_wait": queue_wait
         }
         
     except Exception as e:
-        error_message = str(e)
-        
-        # Handle specific error cases
-        if "api_key" in error_message.lower():
-            error_message = "Invalid API key. Please check your GROQ_API_KEY in .env file."
-        elif "timeout" in error_message.lower():
-            error_message = "Request timed out. Please try again with a smaller code snippet."
-        elif "rate_limit" in error_message.lower():
-            error_message = "Rate limit exceeded. Please wait a moment and try again."
-        else:
-            error_message = f"Error communicating with AI service: {error_message}"
-        
         return {
             "success": False,
-            "error": error_message
+            "error": _describe_error(e)
         }
 
 
-def test_groq_connection() -> bool:
+async def stream_code_explanation(
+    code: str,
+    custom_prompt: str = None,
+    use_rag: bool = False
+) -> AsyncIterator[dict]:
+    """
+    Streams an explanation from LLaMA 3.3 70B via Groq API as it is generated.
+    
+    Args:
+        code: The code snippet to explain
+        custom_prompt: Optional custom prompt (used for RAG-enhanced mode)
+        use_rag: Whether this is a RAG-enhanced request (affects prompting)
+        
+    Yields:
+        {"token": str} for each piece of generated text, then either
+        {"done": True} or {"error": str} as the final event
+    """
+    error = _validate_code(code)
+    if error:
+        yield {"error": error}
+        return
+    
+    completion_args = _build_completion_args(code, custom_prompt, use_rag)
+    cache_key = _cache_key(completion_args)
+    
+    # A cached explanation is sent as a single token
+    explanation = _explanation_cache.get(cache_key)
+    if explanation is not None:
+        yield {"token": explanation}
+        yield {"done": True}
+        return
+    
+    parts = []
+    try:
+        # The slot is held until the stream ends, as its connection is busy
+        async with _groq_call_slot(completion_args):
+            stream = await get_async_client().chat.completions.create(
+                **completion_args,
+                stream=True
+            )
+            
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                token = chunk.choices[0].delta.content
+                if token:
+                    parts.append(token)
+                    yield {"token": token}
+    except Exception as e:
+        yield {"error": _describe_error(e)}
+        return
+    
+    _explanation_cache.set(cache_key, "".join(parts).strip())
+    yield {"done": True}
+
+
+async def test_groq_connection() -> bool:
     """
     Tests the connection to Groq API.
     
+    Lists the available models, which checks reachability and the API key
+    without generating any tokens or counting against the token limit.
+    
     Returns:
         True if connection successful, False otherwise
     """
     try:
-        test_code = "print('Hello, World!')"
-        prompt = create_explanation_prompt(test_code)
-        
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            model=MODEL_NAME,
-            max_tokens=100,
-            timeout=10
-        )
-        
-        return chat_completion.choices[0].message.content is not None
+        models = await get_async_client().models.list(timeout=10)
+        return models is not None
         
     except Exception as e:
         print(f"Connection test failed: {e}")
@@ -5,6 +5,10 @@ Populates ChromaDB with curated code-explanation pairs
 
 import sys
 import os
+import queue
+import threading
+from itertools import islice
+from typing import Iterable, Iterator, List
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -16,6 +20,96 @@ import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Documents per ChromaDB add() call; bounds memory and transaction size
+INGEST_BATCH_SIZE = 128
+
+# Embedded batches allowed to wait for storage; bounds pipeline memory
+PIPELINE_QUEUE_SIZE = 4
+
+# Marks the end of the embedded-batch stream
+_END_OF_BATCHES = object()
+
+
+def chunked(items: Iterable, size: int) -> Iterator[List]:
+    """
+    Split items into consecutive lists of at most size elements.
+    
+    Args:
+        items: Items to split
+        size: Maximum chunk length
+        
+    Yields:
+        Lists of items, in order
+    """
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def ingest_pipelined(rag: RAGSystem, documents: List[dict]) -> bool:
+    """
+    Embed and store documents as a two-stage pipeline.
+    
+    A worker thread embeds batch N+1 while this thread writes batch N to
+    ChromaDB, so encoding and storage overlap instead of alternating. The
+    bounded queue applies backpressure when storage falls behind.
+    
+    Args:
+        rag: Initialized RAG system
+        documents: Documents to ingest, in the order they should be batched
+        
+    Returns:
+        True if every batch was stored
+    """
+    prepared_batches = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    stop = threading.Event()
+    
+    def embed_batches():
+        try:
+            for batch in chunked(documents, INGEST_BATCH_SIZE):
+                if stop.is_set():
+                    break
+                prepared_batches.put(rag.prepare_documents_batch(batch))
+        except Exception as e:
+            prepared_batches.put(e)
+        finally:
+            prepared_batches.put(_END_OF_BATCHES)
+    
+    embedder = threading.Thread(target=embed_batches, name="ingest-embedder", daemon=True)
+    embedder.start()
+    
+    ingested = 0
+    success = True
+    while True:
+        prepared = prepared_batches.get()
+        if prepared is _END_OF_BATCHES:
+            break
+        if not success:
+            continue  # Drain so the embedder is never blocked on a full queue
+        
+        if isinstance(prepared, Exception):
+            logger.error(f"   ✗ Failed to embed documents after {ingested}: {prepared}")
+            success = False
+            continue
+        
+        try:
+            rag.store_documents_batch(prepared)
+        except Exception as e:
+            batch_size = len(prepared['ids'])
+            logger.error(f"   ✗ Failed to ingest documents {ingested + 1}-{ingested + batch_size}: {e}")
+            success = False
+            stop.set()
+            continue
+        
+        ingested += len(prepared['ids'])
+        logger.info(f"   Progress: {ingested}/{len(documents)} documents")
+    
+    embedder.join()
+    return success
+
 
 def ingest_documents(reset_collection: bool = False):
     """
@@ -65,18 +159,20 @@ def ingest_documents(reset_collection: bool = False):
             }
             documents.append(doc)
         
-        # Ingest in batch
+        # Ingest in fixed-size batches of similar-length code, so each
+        # batch's encoder passes need little padding
         logger.info(f"\n5. Ingesting {len(documents)} documents into ChromaDB...")
         logger.info("   This may take a minute for embedding generation...")
         
-        success = rag.add_documents_batch(documents)
-        
-        if success:
-            logger.info("   ✓ Successfully ingested all documents!")
-        else:
-            logger.error("   ✗ Failed to ingest documents")
+        documents.sort(key=lambda doc: len(doc['code']))
+        if not ingest_pipelined(rag, documents):
             return False
         
+        logger.info("   ✓ Successfully ingested all documents!")
+        
+        # Save per-facet counts so /api/rag/stats does not rescan metadata
+        rag.refresh_facet_stats()
+        
         # Verify ingestion
         logger.info("\n6. Verifying ingestion...")
         stats = rag.get_collection_stats()
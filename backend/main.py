@@ -6,66 +6,165 @@ Phase 3: Enhanced with performance monitoring, ethical AI safeguards, and compre
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import Optional, List, Dict
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Optional, List, Dict, AsyncIterator, Tuple
+import asyncio
 import logging
+import os
 import time
+from urllib.parse import parse_qs
+import orjson
 
-from groq_integration import get_code_explanation, test_groq_connection
+from groq_integration import (
+    get_code_explanation,
+    stream_code_explanation,
+    test_groq_connection,
+    close_async_client,
+    truncate_code
+)
 from performance_monitor import get_monitor
 from ethical_ai import get_ethical_guard
-# Lazy imports to avoid startup hang
-# from rag_system import get_rag_system
-# from fine_tuning import build_few_shot_prompt
+from fine_tuning import build_few_shot_prompt, detect_language
+from semantic_cache import SemanticCache
+# rag_system is imported in a worker thread (see _load_rag_system) because
+# importing sentence_transformers and chromadb takes seconds
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class CompressionMiddleware(GZipMiddleware):
+    """
+    GZip responses for clients that accept it, except Server-Sent Event
+    streams (?stream=true): gzip would hold tokens in its buffer instead of
+    sending each event as soon as it is generated.
+    """
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and _is_stream_request(scope):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+def _is_stream_request(scope) -> bool:
+    """Check for a true stream query parameter, as FastAPI parses booleans."""
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return any(value.lower() in ("1", "true", "on", "yes") for value in query.get("stream", ()))
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="JanZ Code Explainer API",
     description="API for explaining code using LLaMA 3.3 70B with RAG, Performance Monitoring, and Ethical AI",
-    version="3.0.0"
+    version="3.0.0",
+    default_response_class=ORJSONResponse  # orjson encodes responses several times faster
 )
 
-# Configure CORS to allow frontend access
+# Configure CORS to allow frontend access. CORS_ORIGINS is a comma-separated
+# list of origins; in production, set it to the frontend's exact origin(s).
+# The API uses no cookies, so credentials are not allowed: with a wildcard
+# origin that lets every response carry a static "*" header instead of an
+# echoed Origin with "Vary: Origin".
+CORS_ORIGINS = [
+    origin.strip()
+    for origin in os.getenv("CORS_ORIGINS", "*").split(",")
+    if origin.strip()
+]
+CORS_MAX_AGE = 86400  # Let browsers cache preflight results (browsers cap this)
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # In production, specify exact origins
-    allow_credentials=True,
-    allow_methods=["*"],
+    allow_origins=CORS_ORIGINS,
+    allow_credentials=False,
+    allow_methods=["GET", "POST"],
     allow_headers=["*"],
+    max_age=CORS_MAX_AGE,
 )
 
+# Compress responses over 1 KB (explanations are typically 2-8 KB of Markdown)
+app.add_middleware(CompressionMiddleware, minimum_size=1024, compresslevel=5)
+
 # Initialize Phase 3 components
 performance_monitor = get_monitor()
 ethical_guard = get_ethical_guard()
 
+# File that keeps performance metrics across restarts (empty: memory only)
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+
+# Batch explanations: snippets per request, and batch snippets explained at
+# once across all batch requests (within groq_integration's global call
+# slots, so batches can't take every slot from interactive requests)
+MAX_BATCH_SIZE = 20
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+batch_semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+
 
 # Request/Response Models
 class CodeExplanationRequest(BaseModel):
     """Request model for code explanation"""
     code: str = Field(..., description="Code snippet to explain", min_length=1, max_length=10000)
+    max_code_tokens: Optional[int] = Field(
+        None,
+        description="Approximate token budget for the code; longer code keeps its start and end",
+        ge=100
+    )
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "code": "def fibonacci(n):\n    if n <= 1:\n        return n\n    return fibonacci(n-1) + fibonacci(n-2)"
             }
         }
+    )
 
 
 class CodeExplanationResponse(BaseModel):
     """Response model for code explanation"""
     explanation: str = Field(..., description="AI-generated explanation of the code")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "explanation": "This code implements a recursive Fibonacci function..."
             }
         }
+    )
+
+
+class BatchExplanationRequest(BaseModel):
+    """Request model for explaining several code snippets at once"""
+    codes: List[str] = Field(
+        ...,
+        description="Code snippets to explain",
+        min_length=1,
+        max_length=MAX_BATCH_SIZE
+    )
+    
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "codes": [
+                    "def square(x):\n    return x * x",
+                    "const add = (a, b) => a + b;"
+                ]
+            }
+        }
+    )
+
+
+class BatchExplanationItem(BaseModel):
+    """Explanation result for one snippet of a batch"""
+    success: bool = Field(..., description="Whether an explanation was generated")
+    explanation: Optional[str] = Field(None, description="AI-generated explanation of the code")
+    error: Optional[str] = Field(None, description="Error message if the snippet failed")
+
+
+class BatchExplanationResponse(BaseModel):
+    """Response model for batch code explanation"""
+    results: List[BatchExplanationItem] = Field(..., description="Results in the same order as the request")
 
 
 class RAGExplanationResponse(BaseModel):
@@ -73,8 +172,8 @@ class RAGExplanationResponse(BaseModel):
     explanation: str = Field(..., description="AI-generated explanation with RAG context")
     retrieved_examples: Optional[List[Dict]] = Field(None, description="Retrieved similar examples")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "explanation": "This code implements...",
                 "retrieved_examples": [
@@ -86,6 +185,7 @@ class RAGExplanationResponse(BaseModel):
                 ]
             }
         }
+    )
 
 
 class ErrorResponse(BaseModel):
@@ -94,7 +194,261 @@ class ErrorResponse(BaseModel):
     detail: Optional[str] = Field(None, description="Additional error details")
 
 
+# /api/rag/stats payload, reused while the collection size is unchanged
+RAG_STATS_TTL = 60  # seconds
+_rag_stats_cache = {"count": -1, "payload": None, "timestamp": 0.0}
+
+# Groq reachability, probed in the background so /health never calls Groq
+GROQ_HEALTH_INTERVAL = 30  # seconds
+
+
+async def _probe_groq_health():
+    """Refresh app.state.groq_healthy every GROQ_HEALTH_INTERVAL seconds."""
+    while True:
+        await asyncio.sleep(GROQ_HEALTH_INTERVAL)
+        healthy = await test_groq_connection()
+        if healthy and not app.state.groq_healthy:
+            logger.info("✓ Groq API connection restored")
+        elif not healthy and app.state.groq_healthy:
+            logger.warning("✗ Groq API connection lost")
+        app.state.groq_healthy = healthy
+
+
+# RAG system (warmed up in the background at startup)
+def _load_rag_system():
+    """
+    Import and initialize the RAG system, then run one query so the
+    embedding model and vector index are warm. Blocking; run in a thread.
+    
+    Returns:
+        The global RAGSystem instance
+    """
+    from rag_system import get_rag_system
+    
+    rag = get_rag_system()
+    rag.retrieve("def f(): pass", top_k=1)
+    return rag
+
+
+async def get_rag():
+    """Get the RAG system, loading it off the event loop if it isn't warm yet."""
+    rag = getattr(app.state, "rag", None)
+    if rag is None:
+        rag = await asyncio.to_thread(_load_rag_system)
+        app.state.rag = rag
+    return rag
+
+
+# Semantic response cache: explanations are reused for code that embeds
+# almost identically to code already explained (one cache per mode). Off by
+# default: short snippets differing by one operator or comparison can embed
+# very closely, and would then get each other's explanation. A hit also
+# requires the same detected language and a similar length.
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "0"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.99"))
+SEMANTIC_CACHE_LENGTH_TOLERANCE = 0.1  # Max relative difference in code length
+SEMANTIC_CACHE_DIR = os.getenv("SEMANTIC_CACHE_DIR", "")  # Empty: memory only
+semantic_caches = {
+    mode: SemanticCache(SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_THRESHOLD)
+    for mode in ('basic', 'rag')
+}
+
+
+async def _semantic_lookup(mode: str, code: str) -> Tuple[Optional[List[float]], Optional[Dict]]:
+    """
+    Embed code and look it up in the mode's semantic cache.
+    
+    The embedding model belongs to the RAG system, so the cache is skipped
+    while it is still warming up rather than waiting for it to load.
+    
+    Args:
+        mode: 'basic' or 'rag'
+        code: Code to be explained
+        
+    Returns:
+        (embedding, cached response), or (None, None) if the cache can't be used
+    """
+    rag = getattr(app.state, "rag", None)
+    if rag is None or SEMANTIC_CACHE_SIZE <= 0:
+        return None, None
+    
+    def lookup():
+        embedding = rag.generate_embedding(code)
+        if not embedding:
+            return None, None
+        cached = semantic_caches[mode].lookup(embedding)
+        if cached is None or not _same_code_shape(cached, code):
+            return embedding, None
+        return embedding, cached
+    
+    return await asyncio.to_thread(lookup)
+
+
+def _same_code_shape(cached: Dict, code: str) -> bool:
+    """Check that a semantic cache hit was made for code of the same language and similar length."""
+    cached_length = cached.get("code_length")
+    if cached_length is None or cached.get("language") != detect_language(code):
+        return False
+    return abs(cached_length - len(code)) <= SEMANTIC_CACHE_LENGTH_TOLERANCE * max(cached_length, len(code))
+
+
+def _semantic_insert(mode: str, embedding: List[float], code: str, response: Dict) -> None:
+    """Cache a response in the mode's semantic cache, tagged with the code's language and length."""
+    semantic_caches[mode].insert(embedding, {
+        **response,
+        "language": detect_language(code),
+        "code_length": len(code)
+    })
+
+
+def _semantic_cache_path(mode: str) -> str:
+    """File a mode's semantic cache is persisted to."""
+    return os.path.join(SEMANTIC_CACHE_DIR, f"{mode}.npz")
+
+
+async def _cached_events(explanation: str) -> AsyncIterator[Dict]:
+    """Replay a cached explanation as stream events."""
+    yield {"token": explanation}
+    yield {"done": True}
+
+
+async def _warm_up_rag():
+    """Load the RAG system before the first RAG request needs it."""
+    try:
+        await get_rag()
+        logger.info("✓ RAG system warmed up")
+    except Exception as e:
+        logger.error(f"RAG warm-up failed, will retry on first use: {str(e)}")
+
+
+# Server-Sent Events streaming
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"  # Stop reverse proxies from buffering the stream
+}
+
+
+def _sse_event(event: Dict) -> bytes:
+    """Frame one event as a Server-Sent Events message."""
+    return b"data: " + orjson.dumps(event) + b"\n\n"
+
+
+async def _stream_explanation(
+    events: AsyncIterator[Dict],
+    mode: str,
+    start_time: float,
+    code_length: int,
+    retrieved_count: int = 0,
+    first_event: Optional[Dict] = None,
+    cache_hit: bool = False
+) -> AsyncIterator[bytes]:
+    """
+    Relay explanation events to the client as they are generated.
+    
+    Once the stream ends, the full explanation is validated and the request
+    is recorded, just like the buffered endpoints do before responding.
+    
+    Args:
+        events: Events from stream_code_explanation
+        mode: 'basic' or 'rag'
+        start_time: When the request was received
+        code_length: Length of input code
+        retrieved_count: Number of documents retrieved (RAG mode)
+        first_event: Optional event sent before any tokens
+        cache_hit: Whether the events replay a semantic cache entry
+        
+    Yields:
+        SSE-framed events
+    """
+    parts = []
+    success = False
+    error_msg = None
+    
+    try:
+        if first_event:
+            yield _sse_event(first_event)
+        
+        async for event in events:
+            if "token" in event:
+                parts.append(event["token"])
+            elif "error" in event:
+                error_msg = event["error"]
+                logger.error(f"Failed to stream explanation: {error_msg}")
+            yield _sse_event(event)
+        
+        if error_msg is None:
+            is_valid, validation_msg = ethical_guard.validate_response("".join(parts))
+            if not is_valid:
+                logger.warning(f"Response validation warning: {validation_msg}")
+            
+            logger.info(f"Successfully streamed {mode} explanation")
+            success = True
+    finally:
+        if not success and error_msg is None:
+            error_msg = "Stream interrupted before completion"
+        performance_monitor.record_request(
+            mode=mode,
+            response_time=time.time() - start_time,
+            success=success,
+            code_length=code_length,
+            retrieved_count=retrieved_count,
+            error=error_msg,
+            cache_hit=cache_hit
+        )
+
+
+# Code longer than this is sanitized in a worker thread; the regex scans take
+# about 0.16 ms per KB, more than a thread hand-off costs beyond this size
+SANITIZE_INLINE_LIMIT = 2000
+
+
+async def _sanitize_code(code: str) -> Tuple[str, List[str]]:
+    """Run the ethical guard's sanitizer without stalling the event loop on long code."""
+    if len(code) <= SANITIZE_INLINE_LIMIT:
+        return ethical_guard.sanitize_code(code)
+    return await asyncio.to_thread(ethical_guard.sanitize_code, code)
+
+
+def _apply_token_budget(code: str, max_code_tokens: Optional[int]) -> str:
+    """Shorten code to the request's token budget, if it set one."""
+    if max_code_tokens is None:
+        return code
+    
+    truncated = truncate_code(code, max_code_tokens)
+    if truncated is not code:
+        logger.info(f"Truncated code from {len(code)} to {len(truncated)} chars (budget: {max_code_tokens} tokens)")
+    return truncated
+
+
+# Fixed sections of the combined few-shot + RAG prompt, joined around the
+# per-request parts
+RAG_CONTEXT_HEADER = "\n\n## Retrieved Similar Examples for Context:\n"
+NO_RAG_CONTEXT = "No highly relevant examples found in database."
+RAG_CODE_HEADER = "\n\n## Code to Explain:\n```\n"
+RAG_PROMPT_FOOTER = (
+    "\n```\n\n"
+    "Provide a comprehensive explanation following the structure shown in the examples above."
+)
+
+
+def _format_retrieved_examples(retrieved_docs: List[Dict]) -> List[Dict]:
+    """Summarize retrieved documents for the API response."""
+    return [
+        {
+            "language": doc["metadata"].get("language", "unknown"),
+            "category": doc["metadata"].get("category", "general"),
+            "subcategory": doc["metadata"].get("subcategory", ""),
+            "difficulty": doc["metadata"].get("difficulty", "medium"),
+            "relevance_score": round(doc["relevance_score"], 3)
+        }
+        for doc in retrieved_docs
+    ]
+
+
 # API Endpoints
+# The explanation endpoints return ORJSONResponse payloads shaped like their
+# response models directly; FastAPI then skips validating and re-encoding the
+# models, and response_model still documents the schema.
 @app.get("/")
 async def root():
     """Root endpoint - API information"""
@@ -107,6 +461,7 @@ async def root():
         "endpoints": {
             "explain": "/api/explain (POST) - Basic explanation",
             "explain_rag": "/api/explain-rag (POST) - RAG-enhanced explanation",
+            "explain_batch": "/api/explain-batch (POST) - Explain several snippets concurrently",
             "health": "/health (GET)",
             "rag_stats": "/api/rag/stats (GET)",
             "docs": "/docs (GET)"
@@ -117,7 +472,7 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    groq_status = test_groq_connection()
+    groq_status = getattr(app.state, "groq_healthy", False)
     
     return {
         "status": "healthy" if groq_status else "degraded",
@@ -127,26 +482,75 @@ async def health_check():
 
 
 @app.post("/api/explain", response_model=CodeExplanationResponse)
-async def explain_code(request: CodeExplanationRequest):
+async def explain_code(request: CodeExplanationRequest, stream: bool = False):
     """
     Explain code using LLaMA 3.3 70B Versatile (Basic Mode - Phase 3 Enhanced).
     
     Takes a code snippet and returns a comprehensive explanation with safety checks.
+    With ?stream=true the explanation is sent as Server-Sent Events while it is
+    generated: {"token": ...} events followed by {"done": true} or {"error": ...}.
     """
     start_time = time.time()
     success = False
+    streaming = False
     error_msg = None
     
     try:
         logger.info(f"Received code explanation request (length: {len(request.code)} chars)")
         
         # Phase 3: Sanitize code for safety
-        sanitized_code, warnings = ethical_guard.sanitize_code(request.code)
+        sanitized_code, warnings = await _sanitize_code(request.code)
         if warnings:
             logger.warning(f"Code sanitization warnings: {warnings}")
         
+        code_to_use = _apply_token_budget(
+            sanitized_code if warnings else request.code,
+            request.max_code_tokens
+        )
+        
+        embedding, cached = await _semantic_lookup('basic', code_to_use)
+        if cached is not None:
+            logger.info("Serving explanation from semantic cache")
+            if stream:
+                streaming = True
+                return StreamingResponse(
+                    _stream_explanation(
+                        _cached_events(cached["explanation"]),
+                        mode='basic',
+                        start_time=start_time,
+                        code_length=len(request.code),
+                        cache_hit=True
+                    ),
+                    media_type="text/event-stream",
+                    headers=SSE_HEADERS
+                )
+            
+            success = True
+            performance_monitor.record_request(
+                mode='basic',
+                response_time=time.time() - start_time,
+                success=True,
+                code_length=len(request.code),
+                cache_hit=True
+            )
+            return ORJSONResponse({"explanation": cached["explanation"]})
+        
+        if stream:
+            # The stream records the request once it finishes
+            streaming = True
+            return StreamingResponse(
+                _stream_explanation(
+                    stream_code_explanation(code_to_use),
+                    mode='basic',
+                    start_time=start_time,
+                    code_length=len(request.code)
+                ),
+                media_type="text/event-stream",
+                headers=SSE_HEADERS
+            )
+        
         # Get explanation from Groq API
-        result = await get_code_explanation(sanitized_code if warnings else request.code)
+        result = await get_code_explanation(code_to_use)
         
         if result["success"]:
             # Phase 3: Validate response quality
@@ -157,16 +561,20 @@ async def explain_code(request: CodeExplanationRequest):
             logger.info("Successfully generated explanation")
             success = True
             
+            if embedding is not None:
+                _semantic_insert('basic', embedding, code_to_use, {"explanation": result["explanation"]})
+            
             response_time = time.time() - start_time
             performance_monitor.record_request(
                 mode='basic',
                 response_time=response_time,
                 success=True,
                 code_length=len(request.code),
-                retrieved_count=0
+                retrieved_count=0,
+                queue_wait_time=result["queue_wait"]
             )
             
-            return CodeExplanationResponse(explanation=result["explanation"])
+            return ORJSONResponse({"explanation": result["explanation"]})
         else:
             error_msg = result.get("error", "Failed to generate explanation")
             logger.error(f"Failed to generate explanation: {error_msg}")
@@ -179,7 +587,7 @@ async def explain_code(request: CodeExplanationRequest):
         logger.error(f"Unexpected error: {error_msg}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {error_msg}")
     finally:
-        if not success:
+        if not success and not streaming:
             response_time = time.time() - start_time
             performance_monitor.record_request(
                 mode='basic',
@@ -190,8 +598,79 @@ async def explain_code(request: CodeExplanationRequest):
             )
 
 
+async def _explain_batch_item(code: str) -> Dict:
+    """
+    Explain one snippet of a batch, holding a concurrency slot for the Groq call.
+    
+    Args:
+        code: Code snippet to explain
+        
+    Returns:
+        Result dictionary from get_code_explanation
+    """
+    start_time = time.time()
+    
+    sanitized_code, warnings = await _sanitize_code(code)
+    if warnings:
+        logger.warning(f"Code sanitization warnings: {warnings}")
+    
+    queued_at = time.perf_counter()
+    async with batch_semaphore:
+        batch_wait = time.perf_counter() - queued_at
+        result = await get_code_explanation(sanitized_code if warnings else code)
+    
+    if result["success"]:
+        is_valid, validation_msg = ethical_guard.validate_response(result["explanation"])
+        if not is_valid:
+            logger.warning(f"Response validation warning: {validation_msg}")
+    else:
+        logger.error(f"Failed to generate batch explanation: {result.get('error')}")
+    
+    performance_monitor.record_request(
+        mode='basic',
+        response_time=time.time() - start_time,
+        success=result["success"],
+        code_length=len(code),
+        error=result.get("error"),
+        queue_wait_time=batch_wait + result.get("queue_wait", 0.0)
+    )
+    return result
+
+
+@app.post("/api/explain-batch", response_model=BatchExplanationResponse)
+async def explain_code_batch(request: BatchExplanationRequest):
+    """
+    Explain several code snippets concurrently (Basic Mode).
+    
+    Snippets are explained in parallel, with at most BATCH_MAX_CONCURRENCY Groq
+    calls in flight across all batch requests. A failing snippet is reported in
+    its result instead of failing the whole batch.
+    """
+    logger.info(f"Received batch explanation request ({len(request.codes)} snippets)")
+    
+    try:
+        # gather returns results in request order
+        results = await asyncio.gather(
+            *(_explain_batch_item(code) for code in request.codes)
+        )
+    except Exception as e:
+        logger.error(f"Unexpected error in batch endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    
+    return ORJSONResponse({
+        "results": [
+            {
+                "success": result["success"],
+                "explanation": result.get("explanation"),
+                "error": result.get("error")
+            }
+            for result in results
+        ]
+    })
+
+
 @app.post("/api/explain-rag", response_model=RAGExplanationResponse)
-async def explain_code_rag(request: CodeExplanationRequest):
+async def explain_code_rag(request: CodeExplanationRequest, stream: bool = False):
     """
     Explain code using RAG-enhanced LLaMA 3.3 70B Versatile (Phase 3 Enhanced).
     
@@ -205,61 +684,124 @@ async def explain_code_rag(request: CodeExplanationRequest):
     - Code sanitization and safety checks
     - Response validation
     - Performance tracking
+    
+    With ?stream=true the explanation is sent as Server-Sent Events: a
+    {"retrieved_examples": [...]} event, then {"token": ...} events as they are
+    generated, then {"done": true} or {"error": ...}.
     """
     start_time = time.time()
     success = False
+    streaming = False
     error_msg = None
     retrieved_count = 0
     
     try:
-        # Lazy import to avoid startup hang
-        from rag_system import get_rag_system
-        from fine_tuning import build_few_shot_prompt
-        
         logger.info(f"Received RAG explanation request (length: {len(request.code)} chars)")
         
         # Phase 3: Sanitize code for safety
-        sanitized_code, warnings = ethical_guard.sanitize_code(request.code)
+        sanitized_code, warnings = await _sanitize_code(request.code)
         if warnings:
             logger.warning(f"Code sanitization warnings: {warnings}")
         
-        code_to_use = sanitized_code if warnings else request.code
+        code_to_use = _apply_token_budget(
+            sanitized_code if warnings else request.code,
+            request.max_code_tokens
+        )
         
-        # Initialize RAG system
-        rag = get_rag_system()
+        # Get the (normally already warm) RAG system
+        rag = await get_rag()
         
-        # Retrieve similar code examples from ChromaDB
+        embedding, cached = await _semantic_lookup('rag', code_to_use)
+        if cached is not None:
+            logger.info("Serving RAG explanation from semantic cache")
+            retrieved_examples = cached["retrieved_examples"]
+            retrieved_count = len(retrieved_examples)
+            if stream:
+                streaming = True
+                return StreamingResponse(
+                    _stream_explanation(
+                        _cached_events(cached["explanation"]),
+                        mode='rag',
+                        start_time=start_time,
+                        code_length=len(request.code),
+                        retrieved_count=retrieved_count,
+                        first_event={"retrieved_examples": retrieved_examples},
+                        cache_hit=True
+                    ),
+                    media_type="text/event-stream",
+                    headers=SSE_HEADERS
+                )
+            
+            success = True
+            performance_monitor.record_request(
+                mode='rag',
+                response_time=time.time() - start_time,
+                success=True,
+                code_length=len(request.code),
+                retrieved_count=retrieved_count,
+                cache_hit=True
+            )
+            return ORJSONResponse({
+                "explanation": cached["explanation"],
+                "retrieved_examples": retrieved_examples if retrieved_examples else None
+            })
+        
+        # Retrieve similar code examples from ChromaDB in a worker thread, so
+        # the embedding and vector search don't block the event loop
         logger.info("Retrieving similar code examples from vector database...")
-        retrieved_docs = rag.retrieve(
+        language = detect_language(code_to_use)  # Shared by retrieval and the prompt
+        retrieval = asyncio.create_task(asyncio.to_thread(
+            rag.retrieve,
             query_code=code_to_use,
             top_k=3,
-            min_relevance=0.65
-        )
+            language=language,
+            min_relevance=0.65,
+            query_embedding=embedding
+        ))
         
+        # Build few-shot prompt with domain-specific examples meanwhile
+        few_shot_prompt = build_few_shot_prompt(code_to_use)
+        
+        retrieved_docs = await retrieval
         retrieved_count = len(retrieved_docs)
         logger.info(f"Retrieved {retrieved_count} relevant examples")
         
         # Build RAG-enhanced prompt with retrieved context
         rag_prompt = rag.build_rag_prompt(
             query_code=code_to_use,
-            retrieved_examples=retrieved_docs
+            retrieved_examples=retrieved_docs,
+            language=language
         )
         
-        # Build few-shot prompt with domain-specific examples
-        few_shot_prompt = build_few_shot_prompt(code_to_use)
-        
         # Combine RAG context with few-shot learning
-        combined_prompt = f"""{few_shot_prompt}
-
-## Retrieved Similar Examples for Context:
-{rag_prompt if retrieved_docs else "No highly relevant examples found in database."}
-
-## Code to Explain:
-```
-{code_to_use}
-```
-
-Provide a comprehensive explanation following the structure shown in the examples above."""
+        combined_prompt = "".join((
+            few_shot_prompt,
+            RAG_CONTEXT_HEADER,
+            rag_prompt if retrieved_docs else NO_RAG_CONTEXT,
+            RAG_CODE_HEADER,
+            code_to_use,
+            RAG_PROMPT_FOOTER
+        ))
+        
+        if stream:
+            # The stream records the request once it finishes
+            streaming = True
+            return StreamingResponse(
+                _stream_explanation(
+                    stream_code_explanation(
+                        code=code_to_use,
+                        custom_prompt=combined_prompt,
+                        use_rag=True
+                    ),
+                    mode='rag',
+                    start_time=start_time,
+                    code_length=len(request.code),
+                    retrieved_count=retrieved_count,
+                    first_event={"retrieved_examples": _format_retrieved_examples(retrieved_docs)}
+                ),
+                media_type="text/event-stream",
+                headers=SSE_HEADERS
+            )
         
         # Call LLaMA with enhanced prompt
         logger.info("Generating explanation with RAG-enhanced prompt...")
@@ -285,25 +827,23 @@ Provide a comprehensive explanation following the structure shown in the example
                 response_time=response_time,
                 success=True,
                 code_length=len(request.code),
-                retrieved_count=retrieved_count
+                retrieved_count=retrieved_count,
+                queue_wait_time=result["queue_wait"]
             )
             
             # Format retrieved examples for response
-            retrieved_examples = [
-                {
-                    "language": doc["metadata"].get("language", "unknown"),
-                    "category": doc["metadata"].get("category", "general"),
-                    "subcategory": doc["metadata"].get("subcategory", ""),
-                    "difficulty": doc["metadata"].get("difficulty", "medium"),
-                    "relevance_score": round(doc["relevance_score"], 3)
-                }
-                for doc in retrieved_docs
-            ]
+            retrieved_examples = _format_retrieved_examples(retrieved_docs)
             
-            return RAGExplanationResponse(
-                explanation=result["explanation"],
-                retrieved_examples=retrieved_examples if retrieved_examples else None
-            )
+            if embedding is not None:
+                _semantic_insert('rag', embedding, code_to_use, {
+                    "explanation": result["explanation"],
+                    "retrieved_examples": retrieved_examples
+                })
+            
+            return ORJSONResponse({
+                "explanation": result["explanation"],
+                "retrieved_examples": retrieved_examples if retrieved_examples else None
+            })
         else:
             error_msg = result.get("error", "Failed to generate RAG explanation")
             logger.error(f"Failed to generate RAG explanation: {error_msg}")
@@ -316,7 +856,7 @@ Provide a comprehensive explanation following the structure shown in the example
         logger.error(f"Unexpected error in RAG endpoint: {error_msg}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {error_msg}")
     finally:
-        if not success:
+        if not success and not streaming:
             response_time = time.time() - start_time
             performance_monitor.record_request(
                 mode='rag',
@@ -336,10 +876,7 @@ async def rag_statistics():
     Returns information about indexed documents, languages, and categories.
     """
     try:
-        # Lazy import to avoid startup hang
-        from rag_system import get_rag_system
-        
-        rag = get_rag_system()
+        rag = await get_rag()
         collection = rag.collection
         
         # Get total document count
@@ -347,30 +884,31 @@ async def rag_statistics():
         
         # Get sample documents to analyze metadata
         if total_docs > 0:
-            results = collection.get(limit=total_docs)
+            # Reuse the last payload if nothing was added or removed recently
+            if (
+                total_docs == _rag_stats_cache["count"]
+                and time.time() - _rag_stats_cache["timestamp"] < RAG_STATS_TTL
+            ):
+                return _rag_stats_cache["payload"]
             
-            # Analyze metadata
-            languages = {}
-            categories = {}
-            difficulties = {}
+            # Counts saved by the last ingest or scan on the first call after
+            # startup, otherwise a fresh metadata scan
+            facets = await asyncio.to_thread(rag.load_facet_stats)
+            if facets is None:
+                facets = await asyncio.to_thread(rag.refresh_facet_stats)
             
-            for metadata in results.get("metadatas", []):
-                lang = metadata.get("language", "unknown")
-                cat = metadata.get("category", "general")
-                diff = metadata.get("difficulty", "medium")
-                
-                languages[lang] = languages.get(lang, 0) + 1
-                categories[cat] = categories.get(cat, 0) + 1
-                difficulties[diff] = difficulties.get(diff, 0) + 1
-            
-            return {
-                "total_documents": total_docs,
-                "languages": languages,
-                "categories": categories,
-                "difficulties": difficulties,
+            stats = {
+                "total_documents": facets["total_documents"],
+                "languages": facets["languages"],
+                "categories": facets["categories"],
+                "difficulties": facets["difficulties"],
                 "embedding_dimension": 384,
-                "model": "sentence-transformers/all-MiniLM-L6-v2"
+                "model": "sentence-transformers/all-MiniLM-L6-v2",
+                "embedding_backend": rag.embedding_backend,
+                "quantization": rag.embedding_quantization
             }
+            _rag_stats_cache.update(count=total_docs, payload=stats, timestamp=time.time())
+            return stats
         else:
             return {
                 "total_documents": 0,
@@ -451,14 +989,11 @@ async def validate_code_safety(request: CodeExplanationRequest):
     Phase 3: Code validation endpoint.
     """
     try:
-        # Sanitize code
-        sanitized_code, warnings = ethical_guard.sanitize_code(request.code)
-        
-        # Check for bias
-        bias_check = ethical_guard.check_bias(request.code)
-        
-        # Quality analysis
-        quality = ethical_guard.check_code_quality(request.code)
+        # Sanitize, check for bias, and analyze quality
+        analysis = ethical_guard.analyze_code(request.code)
+        sanitized_code, warnings = analysis['sanitize']
+        bias_check = analysis['bias']
+        quality = analysis['quality']
         
         return {
             "is_safe": len(warnings) == 0,
@@ -482,19 +1017,29 @@ async def startup_event():
     logger.info("Starting AI Code Explainer API (Phase 3: Enhanced)...")
     logger.info("Testing Groq API connection...")
     
-    if test_groq_connection():
+    app.state.groq_healthy = await test_groq_connection()
+    if app.state.groq_healthy:
         logger.info("✓ Groq API connection successful")
     else:
         logger.warning("✗ Groq API connection failed - check your GROQ_API_KEY")
+    app.state.groq_health_probe = asyncio.create_task(_probe_groq_health())
+    
+    if SEMANTIC_CACHE_DIR:
+        for mode, cache in semantic_caches.items():
+            await asyncio.to_thread(cache.load, _semantic_cache_path(mode))
+    if METRICS_FILE:
+        await asyncio.to_thread(performance_monitor.load, METRICS_FILE)
     
     # Initialize Phase 3 components
     logger.info("✓ Performance monitoring active")
     logger.info("✓ Ethical AI safeguards enabled")
     
-    # RAG system uses lazy loading (loads on first use)
-    logger.info("✓ RAG system configured (lazy loading - will initialize on first use)")
+    # Load the RAG system in the background so startup isn't delayed and
+    # the first RAG request doesn't pay the model loading cost
+    app.state.rag_warmup = asyncio.create_task(_warm_up_rag())
+    logger.info("✓ RAG system warming up in the background")
     logger.info("\nPhase 3 Endpoints:")
-    logger.info("  - Explanation: /api/explain, /api/explain-rag")
+    logger.info("  - Explanation: /api/explain, /api/explain-rag, /api/explain-batch")
     logger.info("  - Metrics: /api/metrics/performance, /api/metrics/history")
     logger.info("  - Ethics: /api/ethics/privacy, /api/ethics/validate-code")
     logger.info("  - RAG: /api/rag/stats")
@@ -506,3 +1051,18 @@ async def shutdown_event():
     """Run on application shutdown"""
     logger.info("Shutting down AI Code Explainer API...")
     logger.info(f"Total requests processed: {performance_monitor.total_requests}")
+    app.state.groq_health_probe.cancel()
+    await close_async_client()
+    
+    if SEMANTIC_CACHE_DIR:
+        for mode, cache in semantic_caches.items():
+            try:
+                await asyncio.to_thread(cache.save, _semantic_cache_path(mode))
+            except Exception as e:
+                logger.error(f"Could not save semantic cache: {str(e)}")
+    
+    if METRICS_FILE:
+        try:
+            await asyncio.to_thread(performance_monitor.save, METRICS_FILE)
+        except Exception as e:
+            logger.error(f"Could not save performance metrics: {str(e)}")
@@ -0,0 +1,182 @@
+"""
+ONNX Runtime Sentence Encoder
+Runs a sentence-transformers model (e.g. an int8-quantized all-MiniLM-L6-v2
+export) with ONNX Runtime instead of PyTorch
+"""
+
+import os
+import logging
+import platform
+from typing import List, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Matches max_seq_length in all-MiniLM-L6-v2's sentence_bert_config.json
+DEFAULT_MAX_SEQ_LENGTH = 256
+
+# Weight types used in the file names of the published quantized exports
+QUANTIZATION_PREFIXES = {"qint8": "int8", "quint8": "uint8"}
+
+
+def describe_quantization(onnx_file: str) -> str:
+    """
+    Describe the quantization of an ONNX export from its file name.
+    
+    Args:
+        onnx_file: e.g. "onnx/model_qint8_avx512_vnni.onnx"
+    
+    Returns:
+        e.g. "int8-avx512_vnni", or "none" for an unquantized export
+    """
+    name = os.path.splitext(os.path.basename(onnx_file))[0]
+    for prefix, weight_type in QUANTIZATION_PREFIXES.items():
+        marker = f"_{prefix}"
+        if marker in name:
+            target = name.split(marker, 1)[1].lstrip("_")
+            return f"{weight_type}-{target}" if target else weight_type
+    return "none"
+
+
+def default_onnx_file() -> str:
+    """
+    Pick the int8 export of all-MiniLM-L6-v2 built for this CPU.
+    
+    The model repository publishes int8 exports quantized for ARM64,
+    AVX-512 VNNI and AVX2. Each runs anywhere, but is fastest on the
+    instruction set it was quantized for.
+    
+    Returns:
+        Path of the ONNX file inside the model repository
+    """
+    machine = platform.machine().lower()
+    if machine in ("arm64", "aarch64"):
+        return "onnx/model_qint8_arm64.onnx"
+    
+    # CPU flags are only readily available on Linux; assume VNNI elsewhere
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            flags = set()
+            for line in f:
+                if line.startswith("flags"):
+                    flags = set(line.split(":", 1)[1].split())
+                    break
+    except OSError:
+        return "onnx/model_qint8_avx512_vnni.onnx"
+    
+    if "avx2" in flags and "avx512_vnni" not in flags:
+        return "onnx/model_quint8_avx2.onnx"
+    return "onnx/model_qint8_avx512_vnni.onnx"
+
+
+class OnnxSentenceEncoder:
+    """
+    Drop-in replacement for SentenceTransformer.encode backed by ONNX Runtime.
+    
+    Reproduces the all-MiniLM-L6-v2 pipeline: tokenize, transformer forward
+    pass, mean pooling over real tokens, and L2 normalization. With the int8
+    quantized exports published in the model repository (onnx/model_qint8_*.onnx)
+    this avoids PyTorch overhead and runs int8 matrix multiplications on CPU.
+    """
+    
+    def __init__(
+        self,
+        model_name: str,
+        onnx_file: str,
+        max_seq_length: int = DEFAULT_MAX_SEQ_LENGTH,
+        num_threads: int = 0
+    ):
+        """
+        Download (or reuse from cache) the ONNX weights and tokenizer.
+        
+        Args:
+            model_name: Hugging Face model repository
+            onnx_file: Path of the ONNX file inside the repository
+            max_seq_length: Tokens per text; longer texts are truncated
+            num_threads: Intra-op threads per forward pass (0 = one per core)
+        """
+        import onnxruntime as ort
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+        
+        model_path = hf_hub_download(model_name, onnx_file)
+        tokenizer_path = hf_hub_download(model_name, "tokenizer.json")
+        
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_seq_length)
+        self.tokenizer.enable_padding()
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            model_path,
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {model_input.name for model_input in self.session.get_inputs()}
+        
+        logger.info(f"Loaded ONNX encoder {model_name}/{onnx_file}")
+    
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Embed one batch of texts into normalized float32 vectors."""
+        encodings = self.tokenizer.encode_batch(texts)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": attention_mask
+        }
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        
+        token_embeddings = self.session.run(None, feeds)[0]
+        
+        # Mean pooling over real (non-padding) tokens, then L2 normalization
+        mask = attention_mask[:, :, np.newaxis].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return (pooled / norms).astype(np.float32)
+    
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        **kwargs
+    ) -> np.ndarray:
+        """
+        Embed one text or a list of texts.
+        
+        Like SentenceTransformer.encode, texts are processed in batches of
+        similar length to minimize padding, and results keep input order.
+        Other SentenceTransformer.encode options (convert_to_tensor,
+        show_progress_bar, ...) are accepted and ignored.
+        
+        Args:
+            sentences: Text or list of texts
+            batch_size: Texts per forward pass
+        
+        Returns:
+            Vector for a single text, or a (len(sentences), dim) array
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        embeddings = None
+        
+        for start in range(0, len(texts), batch_size):
+            indices = order[start:start + batch_size]
+            batch = self._encode_batch([texts[i] for i in indices])
+            if embeddings is None:
+                embeddings = np.empty((len(texts), batch.shape[1]), dtype=np.float32)
+            embeddings[indices] = batch
+        
+        if embeddings is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+
+__all__ = ['OnnxSentenceEncoder', 'default_onnx_file', 'describe_quantization']
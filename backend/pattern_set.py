@@ -0,0 +1,244 @@
+"""
+Multi-Pattern Matching
+Reports which of many regex patterns occur in a text, using a single RE2 set
+scan when google-re2 is installed and falling back to Python's re otherwise
+"""
+
+import re
+import sys
+import logging
+from functools import lru_cache
+from typing import List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import re2  # Optional: pip install google-re2
+except ImportError:
+    re2 = None
+
+# Texts both backends must agree on before the RE2 set is used: Unicode-only
+# spaces, separators, non-ASCII identifiers and case folds, where RE2's
+# defaults differ from re's
+PROBE_TEXTS = (
+    "def na\u00efve(x):\n    return x\n",
+    "eval\v(code)",
+    "exec\x1c(code)",
+    "rm\xa0-rf /",
+    "DROP\u2003TABLE users;",
+    "DELETE\u3000FROM t",
+    "\u017fubprocess.run",
+    "const caf\u00e9 = 1;\nlet \u03c8 = 2\nfn gr\u00f6\u00dfe(x) {}",
+    "x = 1 \x85\nimport os\n",
+    "print(\u0661\u0662\u0663)\n",
+)
+
+# Escapes whose meaning differs between re and RE2, and the class name each
+# stands for (upper case: the complement)
+_CLASS_ESCAPES = {'s': 'space', 'S': 'space', 'w': 'word', 'W': 'word', 'd': 'digit', 'D': 'digit'}
+_ASCII_CLASSES = {
+    'space': r'\t\n\v\f\r ',
+    'word': '0-9A-Za-z_',
+    'digit': '0-9',
+}
+
+
+@lru_cache(maxsize=None)
+def _unicode_class(name: str, negate: bool) -> str:
+    """
+    Contents of a character class matching exactly what re's Unicode \\s,
+    \\w or \\d (or their complements) match in this Python version.
+    
+    RE2's own \\p{...} tables follow a different Unicode version, so the
+    ranges are read off re itself.
+    """
+    pattern = {'space': r'\s+', 'word': r'\w+', 'digit': r'\d+'}[name]
+    if negate:
+        pattern = pattern.upper()
+    
+    # Every code point except surrogates, which RE2 cannot represent
+    text = ''.join(chr(c) for c in range(sys.maxunicode + 1) if not 0xD800 <= c <= 0xDFFF)
+    ranges = []
+    for match in re.finditer(pattern, text):
+        first, last = ord(match.group()[0]), ord(match.group()[-1])
+        # Runs that span the surrogate gap are still contiguous in RE2
+        if ranges and ranges[-1][1] + 1 == first:
+            first = ranges.pop()[0]
+        ranges.append((first, last))
+    
+    return ''.join(
+        f"\\x{{{first:x}}}" if first == last else f"\\x{{{first:x}}}-\\x{{{last:x}}}"
+        for first, last in ranges
+    )
+
+
+def _translate_for_re2(pattern: str, flags: int) -> Optional[str]:
+    """
+    Rewrite a pattern so RE2 matches it exactly as re does.
+    
+    \\s, \\w and \\d (and their complements) become explicit classes,
+    shielded from case folding as re's class escapes are. \\Z becomes
+    RE2's \\z, and without MULTILINE $ also matches before a final
+    newline as in re. Patterns with no exact RE2 equivalent are left to re:
+    \\b and \\B in Unicode mode (RE2's are ASCII-only and it has no
+    lookaround), class escapes inside a case-insensitive [...], and
+    case-insensitive ASCII mode (RE2 folds e.g. the Kelvin sign to k).
+    
+    Args:
+        pattern: re pattern string
+        flags: Flags of the compiled pattern, including inline ones
+    
+    Returns:
+        RE2 pattern string, or None if the pattern must stay on re
+    """
+    ascii_mode = bool(flags & re.ASCII)
+    ignore_case = bool(flags & re.IGNORECASE)
+    if ascii_mode and ignore_case:
+        return None
+    
+    def expand(name: str, negate: bool) -> Tuple[str, bool]:
+        """Class contents for an escape, and whether the class must be negated."""
+        if ascii_mode:
+            return _ASCII_CLASSES[name], negate
+        return _unicode_class(name, negate), False
+    
+    parts = []
+    in_class = False
+    class_start = 0
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\' and i + 1 < len(pattern):
+            escape = pattern[i + 1]
+            i += 2
+            if escape in _CLASS_ESCAPES:
+                contents, negate = expand(_CLASS_ESCAPES[escape], escape.isupper())
+                if in_class:
+                    if negate or ignore_case:
+                        return None
+                    parts.append(contents)
+                else:
+                    parts.append(f"(?-i:[{'^' if negate else ''}{contents}])")
+            elif escape in 'bB' and not in_class:
+                if not ascii_mode:
+                    return None
+                parts.append('\\' + escape)
+            elif escape == 'Z' and not in_class:
+                parts.append('\\z')
+            else:
+                parts.append('\\' + escape)
+            continue
+        
+        if in_class:
+            # A ']' right after '[' or '[^' is a literal
+            if char == ']' and i > class_start:
+                in_class = False
+        elif char == '[':
+            in_class = True
+            class_start = i + 1
+            if pattern.startswith('^', class_start):
+                class_start += 1
+        elif char == '$' and not flags & re.MULTILINE:
+            # RE2's $ is only the very end of the text
+            char = '(?:\\n?\\z)'
+        parts.append(char)
+        i += 1
+    
+    return ''.join(parts)
+
+
+class PatternSet:
+    """
+    A fixed collection of regex patterns matched together against a text.
+    
+    With google-re2 the patterns are compiled into one RE2::Set automaton,
+    so a lookup is a single linear scan regardless of how many patterns
+    there are. Without it, each pattern is precompiled with re and searched
+    in turn.
+    
+    Patterns are rewritten so RE2 matches them exactly as re does (RE2's
+    \\s, \\w and \\d are ASCII-only); any pattern that cannot be expressed
+    in RE2 is still searched with re, as is text RE2 can't take.
+    """
+    
+    def __init__(self, patterns: List[str], flags: int = 0):
+        """
+        Compile the pattern set.
+        
+        Args:
+            patterns: Regex pattern strings
+            flags: re flags (e.g. re.IGNORECASE, re.MULTILINE, re.ASCII) applied to every pattern
+        """
+        self.patterns = list(patterns)
+        self._compiled = [re.compile(p, flags) for p in self.patterns]
+        self._re2_set = None
+        self._re2_indices: List[int] = []  # Pattern index of each RE2 set entry
+        self._re_only: List[int] = list(range(len(self.patterns)))
+        if re2 is not None:
+            self._build_re2_set(flags)
+    
+    def _build_re2_set(self, flags: int) -> None:
+        """Compile the translatable patterns into an RE2 set, keeping re for the rest."""
+        inline = ''.join(
+            letter for flag, letter in ((re.IGNORECASE, 'i'), (re.MULTILINE, 'm'), (re.DOTALL, 's'))
+            if flags & flag
+        )
+        prefix = f"(?{inline})" if inline else ""
+        
+        translated: List[Tuple[int, str]] = []
+        re_only = []
+        for index, pattern in enumerate(self.patterns):
+            rewritten = _translate_for_re2(pattern, self._compiled[index].flags)
+            if rewritten is None:
+                re_only.append(index)
+            else:
+                translated.append((index, rewritten))
+        if not translated:
+            return
+        
+        try:
+            pattern_set = re2.Set.SearchSet()
+            for _, pattern in translated:
+                pattern_set.Add(prefix + pattern)
+            pattern_set.Compile()
+        except Exception as e:
+            logger.warning(f"RE2 could not compile pattern set, using re: {e}")
+            return
+        
+        self._re2_set = pattern_set
+        self._re2_indices = [index for index, _ in translated]
+        self._re_only = re_only
+        
+        # Guard against any remaining semantic difference between the engines
+        for text in PROBE_TEXTS:
+            expected = {i for i, pattern in enumerate(self._compiled) if pattern.search(text)}
+            if self.matches(text) != expected:
+                logger.warning(f"RE2 pattern set disagrees with re on {text!r}, using re")
+                self._re2_set = None
+                self._re2_indices = []
+                self._re_only = list(range(len(self.patterns)))
+                return
+    
+    def matches(self, text: str) -> Set[int]:
+        """
+        Find which patterns occur anywhere in the text.
+        
+        Args:
+            text: Text to scan
+        
+        Returns:
+            Set of indices into ``patterns`` that matched
+        """
+        if self._re2_set is not None:
+            try:
+                re2_matches = self._re2_set.Match(text) or ()
+            except UnicodeEncodeError:
+                # Lone surrogates can't be passed to RE2 as UTF-8
+                return {i for i, pattern in enumerate(self._compiled) if pattern.search(text)}
+            found = {self._re2_indices[i] for i in re2_matches}
+            found.update(i for i in self._re_only if self._compiled[i].search(text))
+            return found
+        return {i for i, pattern in enumerate(self._compiled) if pattern.search(text)}
+
+
+__all__ = ['PatternSet']
@@ -3,14 +3,39 @@ Performance Metrics and Monitoring System
 Tracks response times, accuracy, and system health
 """
 
+import os
 import time
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 from collections import deque
+from itertools import islice
+
+import orjson
 
 logger = logging.getLogger(__name__)
 
+# History entries are plain tuples in this field order; they are much cheaper
+# to build than dicts, and timestamps are only formatted when history is read
+HISTORY_FIELDS = (
+    'timestamp', 'mode', 'response_time', 'success',
+    'code_length', 'retrieved_count', 'error', 'cache_hit', 'queue_wait_time'
+)
+
+# Requests covered by the "recent" response time and failure figures
+RECENT_WINDOW = 10
+
+# Seconds get_statistics reuses its last result, so frequent dashboard
+# polling doesn't recompute it on every call
+STATISTICS_TTL = 1.0
+
+# Running totals written by save() and restored by load()
+PERSISTED_COUNTERS = (
+    'total_requests', 'successful_requests', 'failed_requests',
+    'total_response_time', 'total_queue_wait_time',
+    'rag_requests', 'basic_requests', 'cache_hits'
+)
+
 
 class PerformanceMonitor:
     """
@@ -33,8 +58,17 @@ class PerformanceMonitor:
         self.successful_requests = 0
         self.failed_requests = 0
         self.total_response_time = 0.0
+        self.total_queue_wait_time = 0.0
         self.rag_requests = 0
         self.basic_requests = 0
+        self.cache_hits = 0
+        self._stats_cache: Optional[Tuple[float, Dict]] = None  # (monotonic time, stats)
+        
+        # Last RECENT_WINDOW (success, response_time) pairs with running totals
+        self._recent_window = deque(maxlen=min(RECENT_WINDOW, max_history))
+        self._recent_time_sum = 0.0
+        self._recent_successes = 0
+        self._recent_failures = 0
         
         logger.info("Performance monitor initialized")
     
@@ -45,7 +79,9 @@ class PerformanceMonitor:
         success: bool,
         code_length: int,
         retrieved_count: int = 0,
-        error: Optional[str] = None
+        error: Optional[str] = None,
+        cache_hit: bool = False,
+        queue_wait_time: float = 0.0
     ) -> None:
         """
         Record a request for metrics tracking.
@@ -57,8 +93,13 @@ class PerformanceMonitor:
             code_length: Length of input code
             retrieved_count: Number of documents retrieved (RAG mode)
             error: Error message if failed
+            cache_hit: Whether the response came from the semantic cache
+            queue_wait_time: Time spent waiting for a Groq call slot (seconds)
         """
         self.total_requests += 1
+        self.total_queue_wait_time += queue_wait_time
+        if cache_hit:
+            self.cache_hits += 1
         
         if success:
             self.successful_requests += 1
@@ -66,21 +107,25 @@ class PerformanceMonitor:
         else:
             self.failed_requests += 1
         
+        self._update_recent_window(success, response_time)
+        
         if mode == 'rag':
             self.rag_requests += 1
         else:
             self.basic_requests += 1
         
         # Add to history
-        self.request_history.append({
-            'timestamp': datetime.now().isoformat(),
-            'mode': mode,
-            'response_time': response_time,
-            'success': success,
-            'code_length': code_length,
-            'retrieved_count': retrieved_count,
-            'error': error
-        })
+        self.request_history.append((
+            time.time(),
+            mode,
+            response_time,
+            success,
+            code_length,
+            retrieved_count,
+            error,
+            cache_hit,
+            queue_wait_time
+        ))
         
         logger.info(
             f"Request recorded: mode={mode}, "
@@ -91,9 +136,21 @@ class PerformanceMonitor:
         """
         Get comprehensive performance statistics.
         
+        Results are reused for STATISTICS_TTL seconds.
+        
         Returns:
             Dictionary with performance metrics
         """
+        now = time.monotonic()
+        if self._stats_cache is not None and now - self._stats_cache[0] < STATISTICS_TTL:
+            return self._stats_cache[1]
+        
+        stats = self._compute_statistics()
+        self._stats_cache = (now, stats)
+        return stats
+    
+    def _compute_statistics(self) -> Dict:
+        """Calculate the statistics returned by get_statistics."""
         uptime = (datetime.now() - self.start_time).total_seconds()
         
         # Calculate averages
@@ -115,14 +172,22 @@ class PerformanceMonitor:
             else 0
         )
         
+        avg_queue_wait_time = (
+            self.total_queue_wait_time / self.total_requests
+            if self.total_requests > 0
+            else 0
+        )
+        
+        cache_hit_rate = (
+            (self.cache_hits / self.total_requests * 100)
+            if self.total_requests > 0
+            else 0
+        )
+        
         # Recent performance (last 10 requests)
-        recent_requests = list(self.request_history)[-10:]
-        recent_response_times = [
-            r['response_time'] for r in recent_requests if r['success']
-        ]
         recent_avg_time = (
-            sum(recent_response_times) / len(recent_response_times)
-            if recent_response_times
+            self._recent_time_sum / self._recent_successes
+            if self._recent_successes > 0
             else 0
         )
         
@@ -141,6 +206,7 @@ class PerformanceMonitor:
             'performance': {
                 'avg_response_time': round(avg_response_time, 3),
                 'recent_avg_response_time': round(recent_avg_time, 3),
+                'avg_queue_wait_time': round(avg_queue_wait_time, 3),
                 'total_response_time': round(self.total_response_time, 2)
             },
             'modes': {
@@ -148,12 +214,38 @@ class PerformanceMonitor:
                 'basic_requests': self.basic_requests,
                 'rag_usage_rate': round(rag_usage_rate, 2)
             },
+            'cache': {
+                'semantic_hits': self.cache_hits,
+                'hit_rate': round(cache_hit_rate, 2)
+            },
             'health': {
                 'status': self._get_health_status(),
                 'warnings': self._get_warnings()
             }
         }
     
+    def _update_recent_window(self, success: bool, response_time: float) -> None:
+        """Add a request to the recent window, adjusting the running totals."""
+        window = self._recent_window
+        if len(window) == window.maxlen:
+            old_success, old_time = window[0]
+            if old_success:
+                self._recent_successes -= 1
+                self._recent_time_sum -= old_time
+            else:
+                self._recent_failures -= 1
+        
+        window.append((success, response_time))
+        if success:
+            self._recent_successes += 1
+            self._recent_time_sum += response_time
+        else:
+            self._recent_failures += 1
+        
+        # Don't let rounding error from the subtractions accumulate
+        if self._recent_successes == 0:
+            self._recent_time_sum = 0.0
+    
     def _format_uptime(self, seconds: float) -> str:
         """Format uptime as human-readable string."""
         hours = int(seconds // 3600)
@@ -205,11 +297,9 @@ class PerformanceMonitor:
             )
         
         # Check recent failures
-        recent = list(self.request_history)[-10:]
-        recent_failures = sum(1 for r in recent if not r['success'])
-        if recent_failures >= 3:
+        if self._recent_failures >= 3:
             warnings.append(
-                f"Multiple recent failures: {recent_failures}/10"
+                f"Multiple recent failures: {self._recent_failures}/{RECENT_WINDOW}"
             )
         
         return warnings
@@ -224,8 +314,81 @@ class PerformanceMonitor:
         Returns:
             List of recent requests
         """
-        history = list(self.request_history)
-        return history[-limit:] if len(history) > limit else history
+        history = []
+        for record in self._recent(limit):
+            entry = dict(zip(HISTORY_FIELDS, record))
+            entry['timestamp'] = datetime.fromtimestamp(entry['timestamp']).isoformat()
+            history.append(entry)
+        return history
+    
+    def _recent(self, limit: int) -> List[tuple]:
+        """Return the last ``limit`` history records, oldest first, without copying the rest."""
+        if limit <= 0:
+            return []
+        recent = list(islice(reversed(self.request_history), limit))
+        recent.reverse()
+        return recent
+    
+    def save(self, path: str) -> None:
+        """
+        Write the counters and request history to disk, replacing any
+        previous file atomically.
+        
+        Args:
+            path: Destination file
+        """
+        snapshot = {name: getattr(self, name) for name in PERSISTED_COUNTERS}
+        snapshot['history'] = list(self.request_history)
+        data = orjson.dumps(snapshot)
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        
+        logger.info(f"Saved performance metrics ({self.total_requests} requests) to {path}")
+    
+    def load(self, path: str) -> bool:
+        """
+        Restore counters and history written by save(), so totals carry
+        over across restarts. Uptime still counts from this process's start.
+        
+        Args:
+            path: File to read
+        
+        Returns:
+            True if the file was loaded
+        """
+        if not os.path.exists(path):
+            return False
+        
+        try:
+            with open(path, "rb") as f:
+                snapshot = orjson.loads(f.read())
+            counters = {name: snapshot[name] for name in PERSISTED_COUNTERS}
+            history = [tuple(record) for record in snapshot['history']]
+        except Exception as e:
+            logger.error(f"Could not load performance metrics from {path}: {e}")
+            return False
+        
+        for name, value in counters.items():
+            setattr(self, name, value)
+        self.request_history.clear()
+        self.request_history.extend(history)
+        
+        self._recent_window.clear()
+        self._recent_time_sum = 0.0
+        self._recent_successes = 0
+        self._recent_failures = 0
+        for record in self._recent(self._recent_window.maxlen):
+            self._update_recent_window(record[3], record[2])
+        self._stats_cache = None
+        
+        logger.info(f"Loaded performance metrics ({self.total_requests} requests) from {path}")
+        return True
     
     def reset_metrics(self) -> None:
         """Reset all metrics (admin function)."""
@@ -233,8 +396,15 @@ class PerformanceMonitor:
         self.successful_requests = 0
         self.failed_requests = 0
         self.total_response_time = 0.0
+        self.total_queue_wait_time = 0.0
         self.rag_requests = 0
         self.basic_requests = 0
+        self.cache_hits = 0
+        self._stats_cache = None
+        self._recent_window.clear()
+        self._recent_time_sum = 0.0
+        self._recent_successes = 0
+        self._recent_failures = 0
         self.request_history.clear()
         self.start_time = datetime.now()
         
@@ -4,12 +4,21 @@ Implements vector search with ChromaDB for code explanation enhancement
 """
 
 import os
+import json
+import contextlib
+import time
+import hashlib
 import logging
+import tempfile
+import threading
+from collections import Counter
 from typing import List, Dict, Optional
 import chromadb
 from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
-from fine_tuning import detect_language
+from fine_tuning import SYSTEM_PROMPT, OUTPUT_FORMAT, detect_language
+from response_cache import LRUCache
+from semantic_cache import SemanticCache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -23,6 +32,45 @@ EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 COLLECTION_NAME = "code_explanations"
 RELEVANCE_THRESHOLD = 0.65
 
+# Collection settings. MiniLM embeddings are unit length, so squared L2
+# ranks exactly like cosine/inner product; the space stays "l2" because
+# relevance scores are derived from L2 distances. M and construction_ef
+# apply when a collection is created; search_ef (Chroma's default is 10)
+# raises recall for the 6-20 candidates each query requests.
+COLLECTION_METADATA = {
+    "description": "Code examples with explanations for RAG",
+    "embedding_model": EMBEDDING_MODEL_NAME,
+    "hnsw:space": "l2",
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 64
+}
+FACET_STATS_FILE = "rag_stats.json"  # Per-facet document counts, next to the database
+EMBEDDING_CACHE_SIZE = 4096  # Embeddings kept in memory (~3 KB each)
+EMBEDDING_BATCH_SIZE = 64  # Texts per encoder forward pass when embedding in bulk
+RETRIEVAL_CACHE_SIZE = 128  # Recent retrieve() results reused for near-identical queries
+RETRIEVAL_CACHE_THRESHOLD = 0.97  # Minimum query embedding cosine similarity for reuse
+COLLECTION_COUNT_TTL = 30  # Seconds before the cached document count is rechecked
+
+# Fixed opening of every prompt built by build_rag_prompt
+RAG_PROMPT_PREFIX = f"{SYSTEM_PROMPT}\n\n{OUTPUT_FORMAT}\n\n"
+
+# Embedding backend: "torch" (sentence-transformers) or "onnx" (ONNX Runtime).
+# By default the ONNX backend uses the model repository's int8 export built
+# for this CPU (see onnx_encoder.default_onnx_file); re-run
+# ingest_documents.py --reset after switching so stored vectors match.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "")
+
+# CPU threads per encoder forward pass (0 = library default, one per core).
+# Set to cores / workers when running several Uvicorn workers so their
+# encoders do not oversubscribe the CPU.
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+
+# Compile the PyTorch encoder with torch.compile (opt-in: needs a C++
+# compiler on CPU, and the first calls for new input lengths are slower)
+EMBEDDING_COMPILE = os.getenv("EMBEDDING_COMPILE", "").lower() in ("1", "true", "on", "yes")
+
 
 class RAGSystem:
     """
@@ -42,6 +90,13 @@ class RAGSystem:
         self.embedding_model = None
         self.client = None
         self.collection = None
+        self._embedding_cache = LRUCache(EMBEDDING_CACHE_SIZE)
+        self._retrieval_cache = SemanticCache(RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_THRESHOLD)
+        self._indexed_languages = (-1, frozenset())  # (collection size, languages)
+        self._languages_lock = threading.Lock()  # One recount at a time
+        self._document_count: Optional[int] = None  # Cached collection.count()
+        self._document_counted_at = 0.0  # time.monotonic() of that count
+        self._facet_stats_file_read = False  # The saved counts are used once per process
         
         self._initialize()
     
@@ -63,29 +118,100 @@ class RAGSystem:
             
             # Get or create collection
             logger.info("Step 2: Getting/creating collection...")
+            self._warn_if_index_outdated()
             self.collection = self.client.get_or_create_collection(
                 name=COLLECTION_NAME,
-                metadata={
-                    "description": "Code examples with explanations for RAG",
-                    "embedding_model": EMBEDDING_MODEL_NAME
-                }
+                metadata=COLLECTION_METADATA
             )
             logger.info("Step 2 complete: Collection ready")
             
             # Load embedding model
             logger.info(f"Step 3: Loading embedding model: {EMBEDDING_MODEL_NAME}")
             logger.info("This may take 1-2 minutes on first run (downloading 90MB model)...")
-            self.embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+            if EMBEDDING_BACKEND == "onnx":
+                from onnx_encoder import OnnxSentenceEncoder, default_onnx_file, describe_quantization
+                onnx_file = EMBEDDING_ONNX_FILE or default_onnx_file()
+                self.embedding_backend = "onnx"
+                self.embedding_quantization = describe_quantization(onnx_file)
+                self.embedding_model = OnnxSentenceEncoder(
+                    EMBEDDING_MODEL_NAME, onnx_file, num_threads=EMBEDDING_THREADS
+                )
+            else:
+                self.embedding_backend = "torch"
+                self.embedding_quantization = "none"
+                if EMBEDDING_THREADS > 0:
+                    import torch
+                    torch.set_num_threads(EMBEDDING_THREADS)
+                self.embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+                if EMBEDDING_COMPILE:
+                    self._compile_encoder()
             logger.info("Step 3 complete: Embedding model loaded")
             
             # Check collection size
             count = self.collection.count()
+            self._document_count = count
+            self._document_counted_at = time.monotonic()
             logger.info(f"✓ RAG system initialized. Collection has {count} documents.")
             
         except Exception as e:
             logger.error(f"Failed to initialize RAG system: {e}")
             raise
     
+    def _warn_if_index_outdated(self):
+        """
+        Warn when the stored collection was built with other HNSW settings.
+        
+        Index parameters are fixed when a collection is created, and
+        get_or_create_collection overwrites the stored metadata without
+        rebuilding the index, so this compares before that call.
+        """
+        try:
+            existing = self.client.get_collection(COLLECTION_NAME)
+        except ValueError:
+            return  # Not created yet
+        
+        metadata = existing.metadata or {}
+        outdated = [
+            key for key in ("hnsw:space", "hnsw:M", "hnsw:construction_ef")
+            if metadata.get(key) != COLLECTION_METADATA[key]
+        ]
+        if outdated:
+            logger.warning(
+                f"Collection '{COLLECTION_NAME}' was built with different index "
+                f"settings ({', '.join(outdated)}); run "
+                f"'python ingest_documents.py --reset' to rebuild it"
+            )
+    
+    def _compile_encoder(self):
+        """
+        Replace the transformer with its torch.compile'd version.
+        
+        Compiles with dynamic shapes so varying snippet lengths reuse one
+        graph, and warms it up here rather than on the first request. Falls
+        back to eager mode if compilation fails (e.g. no C++ compiler).
+        """
+        import torch
+        
+        transformer = self.embedding_model[0]
+        eager_model = transformer.auto_model
+        try:
+            transformer.auto_model = torch.compile(eager_model, dynamic=True)
+            self.embedding_model.encode(
+                ["def f(): pass", "def f():\n    return 1\n" * 20],
+                show_progress_bar=False
+            )
+            logger.info("Embedding model compiled with torch.compile")
+        except Exception as e:
+            transformer.auto_model = eager_model
+            logger.error(f"torch.compile failed, using eager mode: {e}")
+    
+    @staticmethod
+    def _embedding_key(text: str) -> bytes:
+        """Embedding cache key; a digest avoids holding large texts."""
+        # surrogatepass: request bodies may carry lone surrogates, which strict
+        # UTF-8 encoding rejects
+        return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+    
     def generate_embedding(self, text: str) -> List[float]:
         """
         Generate embedding vector for text.
@@ -96,17 +222,68 @@ class RAGSystem:
         Returns:
             List of floats representing the embedding
         """
+        # Repeat queries skip the encoder
+        cache_key = self._embedding_key(text)
+        cached = self._embedding_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+        
         try:
             embedding = self.embedding_model.encode(
                 text,
                 convert_to_tensor=False,
                 show_progress_bar=False
-            )
-            return embedding.tolist()
+            ).tolist()
+            self._embedding_cache.set(cache_key, embedding)
+            return list(embedding)
         except Exception as e:
             logger.error(f"Error generating embedding: {e}")
             return []
     
+    def generate_embeddings(
+        self,
+        texts: List[str],
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        cache_results: bool = True
+    ) -> List[List[float]]:
+        """
+        Generate embedding vectors for several texts at once.
+        
+        Texts already in the embedding cache are reused; the rest are
+        encoded in a single call, which batches texts of similar length
+        into each forward pass (minimal padding).
+        
+        Args:
+            texts: Input texts to embed
+            batch_size: Texts per encoder forward pass
+            cache_results: Whether to add new embeddings to the cache
+            
+        Returns:
+            One embedding per text, in input order
+        """
+        keys = [self._embedding_key(text) for text in texts]
+        embeddings = []
+        for key in keys:
+            cached = self._embedding_cache.get(key)
+            embeddings.append(list(cached) if cached is not None else None)
+        misses = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        
+        if misses:
+            logger.info(f"Generating embeddings for {len(misses)} of {len(texts)} texts...")
+            encoded = self.embedding_model.encode(
+                [texts[i] for i in misses],
+                batch_size=batch_size,
+                convert_to_tensor=False,
+                show_progress_bar=False
+            ).tolist()
+            for i, embedding in zip(misses, encoded):
+                if cache_results:
+                    self._embedding_cache.set(keys[i], embedding)
+                    embedding = list(embedding)
+                embeddings[i] = embedding
+        
+        return embeddings
+    
     def add_document(
         self,
         code: str,
@@ -124,6 +301,15 @@ class RAGSystem:
             doc_id: Optional document ID (auto-generated if not provided)
         """
         try:
+            # Generate ID if not provided
+            if not doc_id:
+                doc_id = hashlib.md5(code.encode()).hexdigest()[:16]
+            
+            # Chroma ignores adds for existing IDs, so don't embed them again
+            if self.collection.get(ids=[doc_id], include=[])['ids']:
+                logger.info(f"Document {doc_id} already in collection")
+                return True
+            
             # Generate embedding from code
             embedding = self.generate_embedding(code)
             
@@ -131,11 +317,6 @@ class RAGSystem:
                 logger.error("Failed to generate embedding")
                 return False
             
-            # Generate ID if not provided
-            if not doc_id:
-                import hashlib
-                doc_id = hashlib.md5(code.encode()).hexdigest()[:16]
-            
             # Store explanation in metadata
             metadata['explanation'] = explanation
             
@@ -147,6 +328,7 @@ class RAGSystem:
                 ids=[doc_id]
             )
             
+            self._collection_changed()
             logger.info(f"Added document {doc_id} to collection")
             return True
             
@@ -154,45 +336,81 @@ class RAGSystem:
             logger.error(f"Error adding document: {e}")
             return False
     
-    def add_documents_batch(self, documents: List[Dict]):
+    def prepare_documents_batch(
+        self,
+        documents: List[Dict],
+        batch_size: int = EMBEDDING_BATCH_SIZE
+    ) -> Dict[str, List]:
         """
-        Add multiple documents in batch.
+        Build ids, metadata and embeddings for a batch without storing it.
         
         Args:
             documents: List of dicts with 'code', 'explanation', 'metadata'
+            batch_size: Texts per encoder forward pass
+            
+        Returns:
+            Dict with 'ids', 'documents', 'metadatas' and 'embeddings' lists,
+            ready for store_documents_batch
         """
-        try:
-            codes = []
-            explanations = []
-            metadatas = []
-            ids = []
-            
-            for doc in documents:
-                import hashlib
-                doc_id = doc.get('id', hashlib.md5(doc['code'].encode()).hexdigest()[:16])
-                
-                codes.append(doc['code'])
-                explanations.append(doc['explanation'])
-                
-                metadata = doc.get('metadata', {})
-                metadata['explanation'] = doc['explanation']
-                metadatas.append(metadata)
-                
-                ids.append(doc_id)
+        codes = []
+        metadatas = []
+        ids = []
+        
+        for doc in documents:
+            # Only hash when no ID was given (ingest always supplies one)
+            doc_id = doc.get('id') or hashlib.md5(doc['code'].encode()).hexdigest()[:16]
             
-            # Generate embeddings in batch
-            logger.info(f"Generating embeddings for {len(codes)} documents...")
-            embeddings = [self.generate_embedding(code) for code in codes]
+            codes.append(doc['code'])
             
-            # Add to collection
-            self.collection.add(
-                embeddings=embeddings,
-                documents=codes,
-                metadatas=metadatas,
-                ids=ids
-            )
+            metadata = doc.get('metadata', {})
+            metadata['explanation'] = doc['explanation']
+            metadatas.append(metadata)
             
-            logger.info(f"✓ Added {len(documents)} documents to collection")
+            ids.append(doc_id)
+        
+        # Reuse embeddings already computed for identical code (e.g. snippets
+        # that were queried before being added); documents aren't cached so
+        # a bulk ingest doesn't evict query embeddings
+        embeddings = self.generate_embeddings(codes, batch_size, cache_results=False)
+        
+        return {
+            'ids': ids,
+            'documents': codes,
+            'metadatas': metadatas,
+            'embeddings': embeddings
+        }
+    
+    def store_documents_batch(self, prepared: Dict[str, List]):
+        """
+        Add a batch built by prepare_documents_batch to the collection.
+        
+        Args:
+            prepared: Output of prepare_documents_batch
+        """
+        self.collection.add(
+            embeddings=prepared['embeddings'],
+            documents=prepared['documents'],
+            metadatas=prepared['metadatas'],
+            ids=prepared['ids']
+        )
+        
+        self._collection_changed()
+        logger.info(f"✓ Added {len(prepared['ids'])} documents to collection")
+    
+    def add_documents_batch(
+        self,
+        documents: List[Dict],
+        batch_size: int = EMBEDDING_BATCH_SIZE
+    ):
+        """
+        Add multiple documents in batch.
+        
+        Args:
+            documents: List of dicts with 'code', 'explanation', 'metadata'
+            batch_size: Texts per encoder forward pass
+        """
+        try:
+            self.store_documents_batch(self.prepare_documents_batch(documents, batch_size))
             return True
             
         except Exception as e:
@@ -204,7 +422,8 @@ class RAGSystem:
         query_code: str,
         top_k: int = 5,
         language: Optional[str] = None,
-        min_relevance: float = RELEVANCE_THRESHOLD
+        min_relevance: float = RELEVANCE_THRESHOLD,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict]:
         """
         Retrieve most relevant code examples.
@@ -214,18 +433,21 @@ class RAGSystem:
             top_k: Number of results to return
             language: Filter by programming language
             min_relevance: Minimum relevance score (0-1)
+            query_embedding: Embedding of query_code, if the caller already has it
             
         Returns:
             List of relevant code examples with metadata
         """
         try:
             # Check if collection is empty
-            if self.collection.count() == 0:
+            collection_size = self._collection_size()
+            if collection_size == 0:
                 logger.warning("Collection is empty. Run ingest_documents.py first.")
                 return []
             
-            # Generate query embedding
-            query_embedding = self.generate_embedding(query_code)
+            # Generate query embedding unless the caller computed it
+            if query_embedding is None:
+                query_embedding = self.generate_embedding(query_code)
             
             if not query_embedding:
                 logger.error("Failed to generate query embedding")
@@ -235,9 +457,22 @@ class RAGSystem:
             if not language:
                 language = detect_language(query_code)
             
-            # Build metadata filter
+            # Reuse results for a near-identical recent query with the same
+            # parameters, skipping the vector search. Each cache entry maps
+            # parameters to results, so one snippet retrieved with different
+            # settings keeps a single entry.
+            params = (top_k, language, min_relevance, collection_size)
+            cached = self._retrieval_cache.lookup(query_embedding)
+            if cached is not None and params in cached:
+                return list(cached[params])
+            
+            # Build metadata filter; skip it when no document has the language,
+            # since the filtered query would come back empty and be retried
             where_filter = None
-            if language and language != "unknown":
+            if (
+                language and language != "unknown"
+                and language in self._languages_in_collection(collection_size)
+            ):
                 where_filter = {"language": language}
             
             # Query collection
@@ -272,12 +507,67 @@ class RAGSystem:
             
             logger.info(f"Retrieved {len(filtered_results)} relevant documents (from {len(ranked_results)} candidates)")
             
-            return filtered_results[:top_k]
+            results = filtered_results[:top_k]
+            if cached is not None:
+                cached[params] = results
+            else:
+                self._retrieval_cache.insert(query_embedding, {params: results})
+            return list(results)
             
         except Exception as e:
             logger.error(f"Error during retrieval: {e}")
             return []
     
+    def _collection_size(self) -> int:
+        """
+        Number of stored documents, recounted after writes in this process
+        and otherwise at most every COLLECTION_COUNT_TTL seconds.
+        
+        The periodic recount picks up ingests by other processes: when the
+        count changes, cached retrieval results and the language set are
+        dropped. An external change that keeps the count (e.g. replacing a
+        document) is not detected; restart the server after one. An empty
+        collection is recounted on every call.
+        """
+        count = self._document_count
+        if not count or time.monotonic() - self._document_counted_at >= COLLECTION_COUNT_TTL:
+            count = self.collection.count()
+            if self._document_count is not None and count != self._document_count:
+                self._collection_changed()
+            self._document_count = count
+            self._document_counted_at = time.monotonic()
+        return count
+    
+    def _collection_changed(self):
+        """Drop everything derived from the collection contents after a write."""
+        self._document_count = None
+        self._indexed_languages = (-1, frozenset())
+        self._retrieval_cache.clear()
+    
+    def _languages_in_collection(self, collection_size: int) -> frozenset:
+        """
+        Languages of the stored documents, recounted when the size changes.
+        
+        Args:
+            collection_size: Current collection.count()
+        
+        Returns:
+            Set of language names present in the collection
+        """
+        size, languages = self._indexed_languages
+        if size == collection_size:
+            return languages
+        
+        # retrieve() runs in worker threads; after a change, concurrent
+        # requests wait for one scan instead of each scanning the collection
+        with self._languages_lock:
+            size, languages = self._indexed_languages
+            if size != collection_size:
+                facets = self.load_facet_stats() or self.refresh_facet_stats()
+                languages = frozenset(facets["languages"])
+                self._indexed_languages = (collection_size, languages)
+        return languages
+    
     def _process_results(
         self,
         results: Dict,
@@ -302,10 +592,13 @@ class RAGSystem:
         metadatas = results['metadatas'][0]
         distances = results['distances'][0]
         
+        # Line count of the query, shared by every candidate's length bonus
+        query_lines = query_code.count('\n') + 1
+        
         for doc, metadata, distance in zip(documents, metadatas, distances):
             # Calculate relevance score
             relevance_score = self._calculate_relevance(
-                query_code,
+                query_lines,
                 doc,
                 metadata,
                 distance,
@@ -329,7 +622,7 @@ class RAGSystem:
     
     def _calculate_relevance(
         self,
-        query: str,
+        query_lines: int,
         doc: str,
         metadata: Dict,
         distance: float,
@@ -344,7 +637,7 @@ class RAGSystem:
         - Length similarity
         
         Args:
-            query: Query code
+            query_lines: Number of lines in the query code
             doc: Retrieved document
             metadata: Document metadata
             distance: Embedding distance
@@ -360,14 +653,11 @@ class RAGSystem:
         doc_language = metadata.get("language", "")
         lang_bonus = 0.2 if doc_language == query_language else 0
         
-        # Length similarity bonus (prefer similar complexity)
-        query_lines = len(query.split('\n'))
-        doc_lines = len(doc.split('\n'))
-        if max(query_lines, doc_lines) > 0:
-            length_ratio = min(query_lines, doc_lines) / max(query_lines, doc_lines)
-            length_bonus = 0.1 * length_ratio
-        else:
-            length_bonus = 0
+        # Length similarity bonus (prefer similar complexity); counting
+        # newlines gives the same line count as split without building lists
+        doc_lines = doc.count('\n') + 1
+        length_ratio = min(query_lines, doc_lines) / max(query_lines, doc_lines)
+        length_bonus = 0.1 * length_ratio
         
         # Combine scores
         total_score = similarity + lang_bonus + length_bonus
@@ -379,7 +669,8 @@ class RAGSystem:
         self,
         query_code: str,
         retrieved_examples: List[Dict],
-        max_examples: int = 3
+        max_examples: int = 3,
+        language: Optional[str] = None
     ) -> str:
         """
         Build augmented prompt with retrieved context.
@@ -388,19 +679,21 @@ class RAGSystem:
             query_code: User's code to explain
             retrieved_examples: Retrieved similar examples
             max_examples: Maximum examples to include
+            language: Language of query_code, if the caller already detected
+                it (e.g. for retrieve)
             
         Returns:
             Complete prompt with RAG context
         """
-        from fine_tuning import SYSTEM_PROMPT, OUTPUT_FORMAT, detect_language
+        if not language:
+            language = detect_language(query_code)
         
-        language = detect_language(query_code)
-        
-        # Build context section
+        # Build context section from fragments joined once, rather than
+        # growing a string per example
         if not retrieved_examples:
             context_section = ""
         else:
-            context_section = "Here are similar code examples for reference:\n\n"
+            parts = ["Here are similar code examples for reference:\n\n"]
             
             for i, example in enumerate(retrieved_examples[:max_examples], 1):
                 # Truncate explanation if too long
@@ -408,7 +701,7 @@ class RAGSystem:
                 if len(explanation) > 600:
                     explanation = explanation[:600] + "..."
                 
-                context_section += f"""Example {i} (Relevance: {example['relevance_score']:.2f}, Language: {example['language']}):
+                parts.append(f"""Example {i} (Relevance: {example['relevance_score']:.2f}, Language: {example['language']}):
 
 ```{example['language']}
 {example['code']}
@@ -418,14 +711,14 @@ Explanation: {explanation}
 
 ---
 
-"""
+""")
+            context_section = "".join(parts)
         
         # Build complete prompt
-        prompt = f"""{SYSTEM_PROMPT}
-
-{OUTPUT_FORMAT}
-
-{context_section}
+        prompt = "".join((
+            RAG_PROMPT_PREFIX,
+            context_section,
+            f"""
 
 Now, explain the following code in detail, using a similar comprehensive style:
 
@@ -434,9 +727,86 @@ Now, explain the following code in detail, using a similar comprehensive style:
 ```
 
 Provide a thorough explanation following the structured format above."""
+        ))
         
         return prompt
     
+    @property
+    def facet_stats_path(self) -> str:
+        """Location of the facet counts written by refresh_facet_stats()."""
+        return os.path.join(self.db_path, FACET_STATS_FILE)
+    
+    def refresh_facet_stats(self) -> Dict:
+        """
+        Count documents per language, category and difficulty, and save the
+        counts next to the database so later reads skip the metadata scan.
+        
+        Returns:
+            Dict with 'total_documents', 'languages', 'categories' and 'difficulties'
+        """
+        results = self.collection.get(include=["metadatas"])
+        metadatas = results.get("metadatas") or []
+        
+        stats = {
+            "total_documents": len(metadatas),
+            "languages": dict(Counter(m.get("language", "unknown") for m in metadatas)),
+            "categories": dict(Counter(m.get("category", "general") for m in metadatas)),
+            "difficulties": dict(Counter(m.get("difficulty", "medium") for m in metadatas))
+        }
+        
+        # A temp file per call, so concurrent refreshes (e.g. retrieval and
+        # /api/rag/stats) never write to or replace each other's file
+        temp_path = None
+        try:
+            with tempfile.NamedTemporaryFile(
+                "w",
+                encoding="utf-8",
+                dir=self.db_path,
+                prefix=f"{FACET_STATS_FILE}.",
+                suffix=".tmp",
+                delete=False
+            ) as f:
+                temp_path = f.name
+                json.dump(stats, f)
+            os.replace(temp_path, self.facet_stats_path)
+        except OSError as e:
+            logger.error(f"Could not save facet stats: {e}")
+            if temp_path is not None:
+                with contextlib.suppress(OSError):
+                    os.remove(temp_path)
+        
+        return stats
+    
+    def load_facet_stats(self) -> Optional[Dict]:
+        """
+        Read the facet counts saved by the last ingest or scan, on the first
+        call after startup only.
+        
+        The file lets a fresh process skip its first metadata scan. It can
+        only be checked against the document count, so a change that keeps
+        the count (e.g. a re-ingest with new metadata) would go unnoticed if
+        it were trusted for the life of the process; later calls return
+        None so callers rescan.
+        
+        Returns:
+            Counts as returned by refresh_facet_stats(), or None if this is
+            not the first call or the file is missing, unreadable, or was
+            written for a different number of documents
+        """
+        if self._facet_stats_file_read:
+            return None
+        self._facet_stats_file_read = True
+        
+        try:
+            with open(self.facet_stats_path, encoding="utf-8") as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        if stats.get("total_documents") != self.collection.count():
+            return None
+        return stats
+    
     def get_collection_stats(self) -> Dict:
         """Get statistics about the vector store."""
         try:
@@ -444,11 +814,8 @@ Provide a thorough explanation following the structured format above."""
             
             # Get sample to analyze languages
             if count > 0:
-                sample = self.collection.get(limit=min(count, 100))
-                languages = [m.get('language', 'unknown') for m in sample['metadatas']]
-                lang_counts = {}
-                for lang in languages:
-                    lang_counts[lang] = lang_counts.get(lang, 0) + 1
+                sample = self.collection.get(limit=min(count, 100), include=["metadatas"])
+                lang_counts = dict(Counter(m.get('language', 'unknown') for m in sample['metadatas']))
             else:
                 lang_counts = {}
             
@@ -457,6 +824,8 @@ Provide a thorough explanation following the structured format above."""
                 "languages": lang_counts,
                 "collection_name": COLLECTION_NAME,
                 "embedding_model": EMBEDDING_MODEL_NAME,
+                "embedding_backend": self.embedding_backend,
+                "quantization": self.embedding_quantization,
                 "db_path": self.db_path
             }
         except Exception as e:
@@ -472,11 +841,9 @@ Provide a thorough explanation following the structured format above."""
             # Recreate empty collection
             self.collection = self.client.get_or_create_collection(
                 name=COLLECTION_NAME,
-                metadata={
-                    "description": "Code examples with explanations for RAG",
-                    "embedding_model": EMBEDDING_MODEL_NAME
-                }
+                metadata=COLLECTION_METADATA
             )
+            self._collection_changed()
             logger.info("New empty collection created")
             return True
         except Exception as e:
@@ -486,12 +853,15 @@ Provide a thorough explanation following the structured format above."""
 
 # Initialize global RAG system instance
 _rag_system = None
+_rag_system_lock = threading.Lock()
 
 def get_rag_system() -> RAGSystem:
-    """Get or create global RAG system instance."""
+    """Get or create global RAG system instance (safe to call from threads)."""
     global _rag_system
     if _rag_system is None:
-        _rag_system = RAGSystem()
+        with _rag_system_lock:
+            if _rag_system is None:
+                _rag_system = RAGSystem()
     return _rag_system
 
 
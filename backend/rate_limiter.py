@@ -0,0 +1,62 @@
+"""
+Request Rate Limiting
+Token buckets that pace outgoing API calls below a provider's published limits
+"""
+
+import time
+import asyncio
+
+
+class TokenBucket:
+    """
+    Asyncio token bucket allowing ``rate`` units per ``period`` seconds.
+    
+    The bucket starts full, refills continuously, and callers that need more
+    units than are available wait their turn in arrival order. Pacing calls
+    this way avoids sending requests that the provider would reject and
+    that would then need to be retried.
+    """
+    
+    def __init__(self, rate: float, period: float = 60.0):
+        """
+        Create a full bucket.
+        
+        Args:
+            rate: Units allowed per period (e.g. requests or tokens)
+            period: Length of the period in seconds
+        """
+        self.capacity = rate
+        self._tokens = rate
+        self._fill_rate = rate / period
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    def _refill(self) -> None:
+        """Add the units accrued since the last refill."""
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity,
+            self._tokens + (now - self._last_refill) * self._fill_rate
+        )
+        self._last_refill = now
+    
+    async def acquire(self, amount: float = 1) -> None:
+        """
+        Wait until ``amount`` units are available, then take them.
+        
+        Args:
+            amount: Units to take; capped at the bucket capacity so an
+                oversized request waits for a full bucket instead of forever
+        """
+        amount = min(amount, self.capacity)
+        
+        # Holding the lock while sleeping keeps waiters in FIFO order
+        async with self._lock:
+            self._refill()
+            while self._tokens < amount:
+                await asyncio.sleep((amount - self._tokens) / self._fill_rate)
+                self._refill()
+            self._tokens -= amount
+
+
+__all__ = ['TokenBucket']
@@ -0,0 +1,112 @@
+"""
+Response Caching
+In-process LRU cache, plus single-flight deduplication so concurrent misses
+for the same key compute once
+"""
+
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class LRUCache:
+    """
+    Bounded mapping that evicts the least recently used entry.
+    """
+    
+    def __init__(self, maxsize: int):
+        """
+        Create an empty cache.
+        
+        Args:
+            maxsize: Maximum number of entries (0 disables caching)
+        """
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Look up a key, marking it as most recently used.
+        
+        Args:
+            key: Cache key
+            default: Value returned when the key is missing
+        
+        Returns:
+            Cached value or default
+        """
+        try:
+            value = self._data[key]
+            self._data.move_to_end(key)
+        except KeyError:
+            # Missing, or evicted by another thread between the two steps
+            return default
+        return value
+    
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value, evicting the least recently used entry if full.
+        
+        Args:
+            key: Cache key
+            value: Value to store
+        """
+        if self.maxsize <= 0:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+    
+    def clear(self) -> None:
+        """Remove all cached entries."""
+        self._data.clear()
+
+
+class SingleFlight:
+    """
+    Runs at most one computation per key at a time.
+    
+    The first caller for a key starts the computation as a task; callers
+    that arrive while it is running await the same task and receive the
+    same result or exception. The task is shielded, so a caller that is
+    cancelled (e.g. a client disconnect) does not abort it for the others.
+    """
+    
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+    
+    def __len__(self) -> int:
+        return len(self._tasks)
+    
+    async def run(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the result of compute(), sharing it with concurrent callers.
+        
+        Args:
+            key: Identifies equivalent computations
+            compute: Coroutine function started if none is in flight for key
+        
+        Returns:
+            Result of the in-flight (or newly started) computation
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.create_task(compute())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+    
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        """Forget a completed task so the next caller starts afresh."""
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # Mark a failure as retrieved in case every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+
+__all__ = ['LRUCache', 'SingleFlight']
@@ -12,6 +12,11 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from test_suite import TestSuite
 
+try:
+    import uvloop  # Optional: pip install uvloop (not available on Windows)
+except ImportError:
+    uvloop = None
+
 
 async def run_tests():
     """Run all tests with enhanced reporting."""
@@ -105,7 +110,9 @@ async def run_tests():
 
 def main():
     """Entry point for test runner."""
-    exit_code = asyncio.run(run_tests())
+    # uvloop's event loop has lower per-task overhead than asyncio's default
+    run = uvloop.run if uvloop is not None else asyncio.run
+    exit_code = run(run_tests())
     sys.exit(exit_code)
 
 
@@ -3,6 +3,9 @@ Sample Dataset: Curated code-explanation pairs for RAG system
 Covers multiple languages, algorithms, and common patterns
 """
 
+from collections import Counter
+from functools import lru_cache
+
 CODE_EXPLANATION_DATASET = [
     # Python - Algorithms
     {
@@ -634,28 +637,14 @@ def get_dataset():
     return CODE_EXPLANATION_DATASET
 
 
+@lru_cache(maxsize=1)
 def get_dataset_stats():
-    """Get statistics about the dataset."""
-    total = len(CODE_EXPLANATION_DATASET)
-    
-    languages = {}
-    categories = {}
-    difficulties = {}
-    
-    for doc in CODE_EXPLANATION_DATASET:
-        lang = doc.get('language', 'unknown')
-        cat = doc.get('category', 'unknown')
-        diff = doc.get('difficulty', 'unknown')
-        
-        languages[lang] = languages.get(lang, 0) + 1
-        categories[cat] = categories.get(cat, 0) + 1
-        difficulties[diff] = difficulties.get(diff, 0) + 1
-    
+    """Get statistics about the dataset (computed once; the dataset is static)."""
     return {
-        "total_examples": total,
-        "languages": languages,
-        "categories": categories,
-        "difficulties": difficulties
+        "total_examples": len(CODE_EXPLANATION_DATASET),
+        "languages": dict(Counter(doc.get('language', 'unknown') for doc in CODE_EXPLANATION_DATASET)),
+        "categories": dict(Counter(doc.get('category', 'unknown') for doc in CODE_EXPLANATION_DATASET)),
+        "difficulties": dict(Counter(doc.get('difficulty', 'unknown') for doc in CODE_EXPLANATION_DATASET))
     }
 
 
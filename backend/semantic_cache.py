@@ -0,0 +1,204 @@
+"""
+Semantic Response Cache
+Reuses responses for code whose embedding is nearly identical to code that
+was already explained
+"""
+
+import io
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Rows allocated on the first insert; the matrix doubles as needed up to maxsize
+INITIAL_CAPACITY = 256
+
+
+class SemanticCache:
+    """
+    Nearest-neighbour cache of responses keyed by embedding vectors.
+    
+    Embeddings are L2-normalized and stored as rows of one float32 matrix,
+    so a lookup is a single matrix-vector product giving the cosine
+    similarity to every cached entry. The closest entry is returned when
+    its similarity reaches the threshold. When the cache is full, the entry
+    with the fewest hits (the oldest among ties) is replaced.
+    
+    Methods are thread-safe, so lookups can run in worker threads next to
+    the embedding call.
+    """
+    
+    def __init__(self, maxsize: int = 10000, threshold: float = 0.95):
+        """
+        Create an empty cache.
+        
+        Args:
+            maxsize: Maximum number of entries (0 disables caching)
+            threshold: Minimum cosine similarity for a hit
+        """
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self._vectors: Optional[np.ndarray] = None  # Allocated on first insert
+        self._entries: List[Dict] = []  # Parallel to the matrix rows
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        """Convert an embedding to a unit-length float32 array."""
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm > 0 else array
+    
+    def lookup(self, vector: Sequence[float]) -> Optional[Any]:
+        """
+        Find the cached response for the most similar embedding.
+        
+        Args:
+            vector: Query embedding
+        
+        Returns:
+            Cached response, or None if no entry is similar enough
+        """
+        query = self._normalize(vector)
+        
+        with self._lock:
+            count = len(self._entries)
+            if count == 0 or query.shape[0] != self._vectors.shape[1]:
+                return None
+            
+            scores = self._vectors[:count] @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            
+            entry = self._entries[best]
+            entry['hits'] += 1
+            return entry['response']
+    
+    def insert(self, vector: Sequence[float], response: Any) -> None:
+        """
+        Cache a response under its embedding.
+        
+        Args:
+            vector: Embedding of the request
+            response: JSON-serializable response to return on later hits
+        """
+        if self.maxsize <= 0:
+            return
+        
+        row = self._normalize(vector)
+        entry = {'response': response, 'timestamp': time.time(), 'hits': 0}
+        
+        with self._lock:
+            count = len(self._entries)
+            if self._vectors is None:
+                self._vectors = np.empty(
+                    (min(INITIAL_CAPACITY, self.maxsize), row.shape[0]),
+                    dtype=np.float32
+                )
+            elif row.shape[0] != self._vectors.shape[1]:
+                return
+            
+            if count < self.maxsize:
+                if count == self._vectors.shape[0]:
+                    grown = np.empty(
+                        (min(count * 2, self.maxsize), self._vectors.shape[1]),
+                        dtype=np.float32
+                    )
+                    grown[:count] = self._vectors
+                    self._vectors = grown
+                slot = count
+                self._entries.append(entry)
+            else:
+                slot = min(
+                    range(count),
+                    key=lambda i: (self._entries[i]['hits'], self._entries[i]['timestamp'])
+                )
+                self._entries[slot] = entry
+            
+            self._vectors[slot] = row
+    
+    def clear(self) -> None:
+        """Remove all cached entries."""
+        with self._lock:
+            self._vectors = None
+            self._entries = []
+    
+    def save(self, path: str) -> None:
+        """
+        Write the cache to disk, replacing any previous file atomically.
+        
+        Args:
+            path: Destination file
+        """
+        with self._lock:
+            count = len(self._entries)
+            vectors = self._vectors[:count] if count else np.empty((0, 0), dtype=np.float32)
+            entries = orjson.dumps(self._entries)
+        
+        # Unit vectors keep ample precision as float16 (half the file size);
+        # load() widens them back to float32 for the similarity products
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            vectors=vectors.astype(np.float16),
+            entries=np.frombuffer(entries, dtype=np.uint8)
+        )
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(buffer.getvalue())
+        os.replace(temp_path, path)
+        
+        logger.info(f"Saved {count} semantic cache entries to {path}")
+    
+    def load(self, path: str) -> bool:
+        """
+        Replace the cache contents with a file written by save().
+        
+        Args:
+            path: File to read
+        
+        Returns:
+            True if the file was loaded
+        """
+        if not os.path.exists(path):
+            return False
+        
+        try:
+            with np.load(path) as data:
+                vectors = data['vectors'].astype(np.float32)
+                entries = orjson.loads(data['entries'].tobytes())
+        except Exception as e:
+            logger.error(f"Could not load semantic cache from {path}: {e}")
+            return False
+        
+        # Keep the most useful entries if the file holds more than maxsize
+        keep = sorted(
+            range(len(entries)),
+            key=lambda i: (entries[i]['hits'], entries[i]['timestamp']),
+            reverse=True
+        )[:max(self.maxsize, 0)]
+        keep.sort()
+        
+        with self._lock:
+            self._vectors = vectors[keep] if keep else None
+            self._entries = [entries[i] for i in keep]
+        
+        logger.info(f"Loaded {len(keep)} semantic cache entries from {path}")
+        return True
+
+
+__all__ = ['SemanticCache']
@@ -2,7 +2,12 @@
 View all documents stored in ChromaDB
 """
 from rag_system import get_rag_system
+import sys
 import json
+from collections import Counter
+
+# Documents fetched from ChromaDB per request
+PAGE_SIZE = 500
 
 def view_all_documents():
     """Display all documents in the database"""
@@ -13,77 +18,84 @@ def view_all_documents():
     rag = get_rag_system()
     collection = rag.collection
     
-    # Get all documents
-    results = collection.get()
-    
-    total = len(results['documents'])
+    # Documents are fetched page by page, so memory stays flat and output
+    # starts immediately however large the collection is
+    total = collection.count()
     print(f"\n📊 Total Documents: {total}\n")
     
     if total == 0:
         print("⚠️  Database is empty. Run: python ingest_documents.py --reset")
         return
     
-    # Display each document
-    for i, (doc_id, doc, metadata) in enumerate(zip(
-        results['ids'], 
-        results['documents'], 
-        results['metadatas']
-    ), 1):
-        print(f"\n{'='*80}")
-        print(f"📄 Document {i}/{total}")
-        print(f"{'='*80}")
-        print(f"ID: {doc_id}")
-        print(f"Language: {metadata.get('language', 'N/A').upper()}")
-        print(f"Category: {metadata.get('category', 'N/A')}")
-        print(f"Subcategory: {metadata.get('subcategory', 'N/A')}")
-        print(f"Difficulty: {metadata.get('difficulty', 'N/A')}")
+    # Counts for the summary, accumulated while paging
+    languages = Counter()
+    categories = Counter()
+    difficulties = Counter()
+    
+    shown = 0
+    while True:
+        page = collection.get(
+            limit=PAGE_SIZE,
+            offset=shown,
+            include=["documents", "metadatas"]
+        )
+        if not page['ids']:
+            break
+        
+        # Build the page's text and write it at once rather than one
+        # print (and terminal write) per line
+        lines = []
+        for doc_id, doc, metadata in zip(page['ids'], page['documents'], page['metadatas']):
+            shown += 1
+            lines.append(f"\n{'='*80}")
+            lines.append(f"📄 Document {shown}/{total}")
+            lines.append(f"{'='*80}")
+            lines.append(f"ID: {doc_id}")
+            lines.append(f"Language: {metadata.get('language', 'N/A').upper()}")
+            lines.append(f"Category: {metadata.get('category', 'N/A')}")
+            lines.append(f"Subcategory: {metadata.get('subcategory', 'N/A')}")
+            lines.append(f"Difficulty: {metadata.get('difficulty', 'N/A')}")
+            
+            # Show explanation if available
+            explanation = metadata.get('explanation', '')
+            if explanation:
+                lines.append("\nExplanation (first 150 chars):")
+                lines.append("-" * 80)
+                lines.append(explanation[:150] + "..." if len(explanation) > 150 else explanation)
+                lines.append("-" * 80)
+            
+            lines.append("\nCode Preview (first 300 chars):")
+            lines.append("-" * 80)
+            lines.append(doc[:300] + "..." if len(doc) > 300 else doc)
+            lines.append("-" * 80)
         
-        # Show explanation if available
-        explanation = metadata.get('explanation', '')
-        if explanation:
-            print(f"\nExplanation (first 150 chars):")
-            print("-" * 80)
-            print(explanation[:150] + "..." if len(explanation) > 150 else explanation)
-            print("-" * 80)
+        lines.append("")
+        sys.stdout.write("\n".join(lines))
         
-        print(f"\nCode Preview (first 300 chars):")
-        print("-" * 80)
-        print(doc[:300] + "..." if len(doc) > 300 else doc)
-        print("-" * 80)
+        metadatas = page['metadatas']
+        languages.update(m.get('language', 'unknown') for m in metadatas)
+        categories.update(m.get('category', 'unknown') for m in metadatas)
+        difficulties.update(m.get('difficulty', 'unknown') for m in metadatas)
     
     # Summary statistics
     print(f"\n{'='*80}")
     print("📈 SUMMARY STATISTICS")
     print(f"{'='*80}")
     
-    # Count by language
-    languages = {}
-    categories = {}
-    difficulties = {}
-    
-    for metadata in results['metadatas']:
-        lang = metadata.get('language', 'unknown')
-        cat = metadata.get('category', 'unknown')
-        diff = metadata.get('difficulty', 'unknown')
-        
-        languages[lang] = languages.get(lang, 0) + 1
-        categories[cat] = categories.get(cat, 0) + 1
-        difficulties[diff] = difficulties.get(diff, 0) + 1
-    
     print(f"\n📚 By Language:")
-    for lang, count in sorted(languages.items(), key=lambda x: x[1], reverse=True):
+    for lang, count in languages.most_common():
         print(f"   {lang.upper()}: {count}")
     
     print(f"\n🏷️  By Category:")
-    for cat, count in sorted(categories.items(), key=lambda x: x[1], reverse=True):
+    for cat, count in categories.most_common():
         print(f"   {cat}: {count}")
     
     print(f"\n⭐ By Difficulty:")
-    for diff, count in sorted(difficulties.items(), key=lambda x: x[1], reverse=True):
+    for diff, count in difficulties.most_common():
         print(f"   {diff.upper()}: {count}")
     
     print(f"\n{'='*80}")
-    print(f"✅ Viewing complete: {total} documents displayed")
+    print(f"✅ Viewing complete: {shown} documents displayed")
     print(f"{'='*80}\n")
 
 if __name__ == "__main__":